@@ -0,0 +1,338 @@
+import io
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import zy1
+
+
+OWNER_CSV_HEADER = "姓名,身份证号,电话号码,车辆品牌,购买日期,保险到期日\n"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return zy1.ClaimsRepository(str(tmp_path / "claims.db"))
+
+
+def new_owner(repo, brand="丰田"):
+    return {"车主编号": repo.next_owner_id(), "姓名": "测试", "身份证号": "110101199001011234",
+            "电话号码": "13800000000", "邮箱": "", "地址": "北京市朝阳区", "车牌号": "京A12345",
+            "车辆品牌": brand, "车辆型号": "轿车", "购买日期": "2023-01-01", "保险到期日": "2025-01-01",
+            "注册时间": "2024-01-01 08:00:00"}
+
+
+def new_claim(repo, owner_id, amount=5000):
+    return {"索赔编号": repo.next_claim_id(), "车主编号": owner_id, "索赔类型": "划痕",
+            "事故日期": "2024-03-01", "申请日期": "2024-03-02", "索赔金额": amount, "批准金额": 0,
+            "处理状态": "待审核", "事故描述": "测试", "处理备注": "", "处理人员": "张专员",
+            "创建时间": "2024-03-02 09:00:00", "更新时间": "2024-03-02 09:00:00"}
+
+
+def assert_same_data(repo, other):
+    pd.testing.assert_frame_equal(repo.owners_data.astype(object), other.owners_data.astype(object))
+    pd.testing.assert_frame_equal(repo.claims_data.astype(object), other.claims_data.astype(object))
+
+
+def import_owners(repo, text):
+    return zy1.import_file(repo, "owners", io.BytesIO(text.encode("utf-8")), "owners.csv")
+
+
+def test_import_owners_requires_dates(repo):
+    count, errors = import_owners(repo, OWNER_CSV_HEADER
+                                  + "张三,110101199001011234,13800000000,丰田,2023-01-01,2025-01-01\n"
+                                  + "李四,110101199001011235,13800000001,丰田,2023-01-01,\n"
+                                  + "王五,110101199001011236,13800000002,丰田,,2025-01-01\n")
+    assert count == 1
+    assert errors[["行号", "字段"]].values.tolist() == [[2, "保险到期日"], [3, "购买日期"]]
+    assert not repo.owners_data[["购买日期", "保险到期日"]].isna().any().any()
+
+
+def test_import_owners_missing_date_column(repo):
+    with pytest.raises(ValueError, match="保险到期日"):
+        import_owners(repo, "姓名,身份证号,电话号码,车辆品牌,购买日期\n"
+                            "张三,110101199001011234,13800000000,丰田,2023-01-01\n")
+
+
+def test_import_owners_rejects_unknown_brand(repo):
+    brands = set(repo.owners_data["车辆品牌"].cat.categories)
+    count, errors = import_owners(repo, OWNER_CSV_HEADER
+                                  + "张三,110101199001011234,13800000000,特斯拉,2023-01-01,2025-01-01\n")
+    assert count == 0
+    assert errors["字段"].tolist() == ["车辆品牌"]
+    assert set(repo.owners_data["车辆品牌"].cat.categories) == brands
+
+
+def test_csv_bytes():
+    data = zy1.csv_bytes(pd.DataFrame({"行号": [1], "问题": ["必填"]}))
+    assert isinstance(data, bytes)
+    assert data.decode("utf-8-sig").splitlines() == ["行号,问题", "1,必填"]
+
+
+@pytest.mark.parametrize("engine", ["xlsxwriter", "openpyxl"])
+def test_export_to_excel_date_formats(monkeypatch, engine):
+    openpyxl = pytest.importorskip("openpyxl")
+    if engine == "xlsxwriter":
+        pytest.importorskip("xlsxwriter")
+    else:
+        monkeypatch.setattr(zy1, "xlsxwriter", None)
+    _, claims = zy1.generate_sample_data(5, 3, seed=1)
+    claims = zy1.apply_dtypes(claims, zy1.CLAIM_DTYPES)
+    sheet = openpyxl.load_workbook(zy1.export_to_excel([claims], ["索赔记录"]))["索赔记录"]
+    header = [cell.value for cell in sheet[1]]
+    for col in ["事故日期", "申请日期"]:
+        assert sheet.cell(2, header.index(col) + 1).number_format == "yyyy-mm-dd"
+    for col in ["创建时间", "更新时间"]:
+        assert sheet.cell(2, header.index(col) + 1).number_format.endswith("h:mm:ss")
+    assert sheet.cell(2, header.index("申请日期") + 1).value == claims["申请日期"].iloc[0]
+
+
+def test_buffered_table_compact_keeps_dtypes():
+    owners, claims = zy1.generate_sample_data(20, 50, seed=1)
+    table = zy1.BufferedTable(claims.copy(), "索赔编号", zy1.CLAIM_DTYPES)
+    row = dict(claims.iloc[0], 索赔编号="CL000051", 处理状态="补充材料", 处理人员=None)
+    table.append(row)
+    assert len(table) == 51
+    expected = zy1.apply_dtypes(pd.concat([claims, pd.DataFrame([row])], ignore_index=True), zy1.CLAIM_DTYPES)
+    frame = table.frame
+    assert (frame.dtypes == expected.dtypes).all()
+    pd.testing.assert_frame_equal(frame.astype(object), expected.astype(object))
+
+
+def test_refresh_applies_other_process_changes(repo, tmp_path):
+    other = zy1.ClaimsRepository(repo.db_path)
+    owners, claims, version = other.owners, other.claims, other.version
+
+    # 只预留编号不触发同步
+    repo.next_claim_id()
+    other.refresh()
+    assert other.version == version
+
+    owner = new_owner(repo)
+    repo.add_owner(owner)
+    repo.add_claim(new_claim(repo, owner["车主编号"]))
+    repo.add_claim(new_claim(repo, "OW999999"))
+    claim_id = repo.claims_data["索赔编号"].iloc[0]
+    repo.update_claim(claim_id, {"处理状态": "已批准", "批准金额": 100, "更新时间": "2024-05-01 10:00:00"})
+    repo.update_owner(repo.owners_data["车主编号"].iloc[0], {"车辆品牌": "宝马"})
+    other.refresh()
+
+    # 增量同步，不重新加载整表
+    assert other.owners is owners and other.claims is claims
+    assert other.version > version
+    assert_same_data(repo, other)
+    assert other.stats.snapshot() == repo.stats.snapshot()
+
+    # 本进程的修改在同步时不会重复应用
+    other.update_claim(claim_id, {"处理状态": "已结案"})
+    repo.refresh()
+    other.refresh()
+    assert_same_data(repo, other)
+    assert other.stats.snapshot() == repo.stats.snapshot()
+
+
+def test_sorted_index_updated_in_place(repo):
+    index = repo.claims.sorted_index("更新时间")
+    claim_ids = repo.claims_data["索赔编号"].tolist()
+    for n, claim_id in enumerate(claim_ids[:30]):
+        repo.update_claim(claim_id, {"处理状态": "审核中", "更新时间": f"2030-01-{n % 28 + 1:02d} 10:00:00"})
+    repo.add_claim(new_claim(repo, repo.owners_data["车主编号"].iloc[0]))
+    repo.update_claim(repo.claims_data["索赔编号"].iloc[-1], {"更新时间": "2020-01-01 00:00:00"})
+    assert repo.claims.sorted_index("更新时间") is index
+
+    claims = repo.claims_data
+    values = claims["更新时间"].to_numpy()
+    assert (values[index.descending()] == np.sort(values)[::-1]).all()
+    low, high = pd.Timestamp("2030-01-05"), pd.Timestamp("2030-01-20")
+    expected = np.flatnonzero(((claims["更新时间"] >= low) & (claims["更新时间"] <= high)).to_numpy())
+    assert index.range(low.to_datetime64(), high.to_datetime64()).tolist() == expected.tolist()
+
+
+def test_stats_and_queries_after_changes(repo):
+    # 先建好有序索引，之后的修改都在原索引上增量维护
+    for col in zy1.CLAIM_SORTED_COLUMNS:
+        repo.claims.sorted_index(col)
+
+    owner = new_owner(repo, "奔驰")
+    repo.add_owner(owner)
+    repo.add_claim(new_claim(repo, owner["车主编号"], 12000))
+    repo.add_claim(new_claim(repo, "OW999999", 800))
+    claim_ids = repo.claims_data["索赔编号"].tolist()
+    repo.update_claim(claim_ids[0], {"处理状态": "已批准", "批准金额": 3000, "更新时间": "2031-01-01 10:00:00"})
+    repo.update_claim(claim_ids[1], {"处理状态": "已拒绝", "更新时间": "2031-01-02 10:00:00"})
+    repo.update_owner(repo.owners_data["车主编号"].iloc[0], {"车辆品牌": "宝马"})
+    bulk = pd.DataFrame([new_claim(repo, owner_id, 1000 * (n + 1)) for n, owner_id in
+                         enumerate(repo.owners_data["车主编号"].iloc[:5])]).drop(columns="索赔编号")
+    repo.add_claims(zy1.apply_dtypes(bulk, zy1.CLAIM_DTYPES))
+
+    assert repo.stats.snapshot() == zy1.RunningStats.from_frames(repo.owners_data, repo.claims_data).snapshot()
+
+    claims = repo.claims_data
+    amounts = claims["索赔金额"]
+    query = repo.query_claims().range("索赔金额", 3000, 20000)
+    expected = claims[(amounts > 3000) & (amounts <= 20000)]
+    assert query.count() == len(expected)
+    assert query.values("索赔编号").tolist() == expected["索赔编号"].tolist()
+
+    start, end = claims["申请日期"].quantile([0.2, 0.8])
+    query = repo.query_claims().between("申请日期", start, end).isin("处理状态", ["待审核", "审核中"])
+    expected = claims[claims["申请日期"].between(start, end) & claims["处理状态"].isin(["待审核", "审核中"])]
+    assert len(expected) > 0
+    assert query.values("索赔编号").tolist() == expected["索赔编号"].tolist()
+
+    query = repo.query_claims().equals("处理状态", "待审核")
+    expected = claims[claims["处理状态"] == "待审核"].nlargest(10, "更新时间")
+    assert query.largest("更新时间", 10)["更新时间"].tolist() == expected["更新时间"].tolist()
+    assert repo.query_claims().largest("更新时间", 2)["索赔编号"].tolist() == claim_ids[1::-1]
+
+
+def test_query_page_matches_sort_values():
+    _, claims = zy1.generate_sample_data(100, 2000, seed=5)
+    table = zy1.BufferedTable(claims, "索赔编号", zy1.CLAIM_DTYPES, sorted_columns=zy1.CLAIM_SORTED_COLUMNS)
+    data = table.frame
+    for column in ["申请日期", "索赔金额", "更新时间", "事故日期"]:
+        for ascending in (False, True):
+            query = zy1.Query(data, table.sorted_index).equals("处理状态", "已批准")
+            expected = data.iloc[query.positions].sort_values(column, ascending=ascending, kind="stable")
+            pages = [query.page(column, ascending, start, 37) for start in range(0, len(expected) + 37, 37)]
+            # 值相同的行顺序可以不同，逐页比较排序列的值，合起来比较行集合
+            for start, page in zip(range(0, len(expected), 37), pages):
+                assert page[column].tolist() == expected[column].iloc[start:start + 37].tolist(), (column, start)
+            assert sorted(pd.concat(pages)["索赔编号"]) == sorted(expected["索赔编号"])
+
+
+def test_export_queue_builds_snapshot_in_worker():
+    queue = zy1.ExportQueue(workers=2)
+    release, threads = threading.Event(), []
+
+    def build():
+        threads.append(threading.current_thread())
+        release.wait(5)
+        return [pd.DataFrame({"行号": [1, 2]})], ["测试"]
+
+    # 快照未取出时登记立即返回，其他请求也不必等待
+    job = queue.submit("a", build, "CSV (.csv)", "测试")
+    other = queue.submit("b", build, "CSV (.csv)", "测试")
+    assert queue.submit("a", build, "CSV (.csv)", "测试") is job
+    assert not job.done and not other.done
+    release.set()
+    for _ in range(500):
+        if job.done and other.done:
+            break
+        time.sleep(0.01)
+    assert job.status == other.status == "已完成"
+    assert threading.current_thread() not in threads
+    assert job.sheet_names == ["测试"] and job.rows_written == job.total_rows == 2
+    assert job.read(job.artifacts[0][3]).decode("utf-8-sig").splitlines() == ["行号", "1", "2"]
+
+
+def run_with_readers(read, write, readers=2):
+    """write 执行期间其他线程反复调用 read，返回读线程抛出的异常"""
+    done, errors = threading.Event(), []
+
+    def reader():
+        try:
+            while not done.is_set():
+                read()
+        except Exception as exc:
+            errors.append(exc)
+
+    # 缩短线程切换间隔，让读写更容易交错
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    try:
+        write()
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(interval)
+    return errors
+
+
+def test_sorted_index_concurrent_readers():
+    _, claims = zy1.generate_sample_data(200, 3000, seed=3)
+    table = zy1.BufferedTable(claims, "索赔编号", zy1.CLAIM_DTYPES, sorted_columns=zy1.CLAIM_SORTED_COLUMNS)
+    index = table.sorted_index("更新时间")
+    low, high = pd.Timestamp("2030-01-01").to_datetime64(), pd.Timestamp("2030-12-31").to_datetime64()
+
+    def read():
+        index.range(low, high)
+        index.descending()
+
+    def write():
+        for n, claim_id in enumerate(claims["索赔编号"].iloc[:300]):
+            table.update(claim_id, {"更新时间": f"2030-{n % 12 + 1:02d}-01 10:00:00"})
+
+    assert run_with_readers(read, write) == []
+    values = table.frame["更新时间"].to_numpy()
+    assert (values[index.descending()] == np.sort(values)[::-1]).all()
+    assert len(index.range(low, high)) == 300
+
+
+def search_queries(values, rng, count=40):
+    queries = ["OW", "W0", "O", "00", "0", "京A", "张", "138", "X", "OW0000", "不存在"]
+    for value in rng.choice(values, count):
+        start = rng.integers(0, len(value))
+        queries.append(value[start:start + rng.integers(1, 6)])
+    return queries
+
+
+def assert_search_matches(table, columns, rng):
+    frame = table.frame
+    for col in columns:
+        for query in search_queries(frame[col].dropna().tolist(), rng):
+            expected = np.flatnonzero(frame[col].str.contains(query, regex=False, na=False).to_numpy())
+            assert table.search(col, query).index.tolist() == frame.index[expected].tolist(), (col, query)
+
+
+def test_search_indexes_match_str_contains():
+    rng = np.random.default_rng(0)
+    owners, _ = zy1.generate_sample_data(3000, 0, seed=2)
+    table = zy1.BufferedTable(owners.iloc[:2000].copy(), "车主编号", zy1.OWNER_DTYPES, zy1.OWNER_SEARCH_COLUMNS)
+    assert_search_matches(table, zy1.OWNER_SEARCH_COLUMNS, rng)
+
+    # 单条新增、批量追加、修改（含不符合编号格式的值和空值）之后结果仍与逐行比较一致
+    for row in owners.iloc[2000:2100].to_dict("records"):
+        table.append(row)
+    table.extend(owners.iloc[2100:].copy())
+    for n, owner_id in enumerate(rng.choice(owners["车主编号"], 200, replace=False)):
+        table.update(owner_id, {"姓名": f"改名{n}", "车牌号": None if n % 7 == 0 else f"沪B{n:05d}",
+                                "电话号码": "未知" if n % 5 == 0 else f"139{n:08d}"})
+    assert_search_matches(table, zy1.OWNER_SEARCH_COLUMNS, rng)
+
+
+def test_search_indexes_concurrent_readers():
+    owners, _ = zy1.generate_sample_data(2000, 0, seed=4)
+    table = zy1.BufferedTable(owners, "车主编号", zy1.OWNER_DTYPES, zy1.OWNER_SEARCH_COLUMNS)
+
+    def read():
+        table.search("姓名", "改名")
+        table.search("电话号码", "139")
+
+    def write():
+        for n, owner_id in enumerate(owners["车主编号"].iloc[:300]):
+            table.update(owner_id, {"姓名": f"改名{n}", "电话号码": f"139{n:08d}"})
+
+    assert run_with_readers(read, write) == []
+    assert len(table.search("姓名", "改名")) == 300
+    assert_search_matches(table, ["姓名", "电话号码"], np.random.default_rng(0))
+
+
+def test_digit_search_index_mixed_widths():
+    values = ["OW000123", "OW1234567", "OW", "OWX1", None, "OW000999", "CL000123", "OW0001230"]
+    index = zy1.DigitSearchIndex(values, "OW")
+    index.add(8, "OW120000")
+    index.remove(5, "OW000999")
+    index.add(5, "OW999")
+    values[5:] = ["OW999", "CL000123", "OW0001230", "OW120000"]
+    series = pd.Series(values, dtype=object)
+    for query in ["OW", "W", "O", "OW0", "W00012", "12", "123", "0123", "23456", "000", "999", "X1", "CL", "7", "01230"]:
+        expected = np.flatnonzero(series.str.contains(query, regex=False, na=False).to_numpy())
+        assert index.search(query).tolist() == expected.tolist(), query
@@ -5,8 +5,49 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
-from io import BytesIO
 import uuid
+import os
+import sys
+import re
+import argparse
+import itertools
+import json
+import time
+import tracemalloc
+import contextlib
+import cProfile
+import pstats
+import io
+import logging
+import sqlite3
+import tempfile
+import codecs
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from collections import Counter, defaultdict, deque
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
 # 页面配置
 st.set_page_config(
@@ -43,95 +84,2251 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 初始化session state
-if 'owners_data' not in st.session_state:
-    st.session_state.owners_data = None
-if 'claims_data' not in st.session_state:
-    st.session_state.claims_data = None
-if 'initialized' not in st.session_state:
-    st.session_state.initialized = False
-
-
-def generate_sample_data():
+# 数据库路径（所有会话、所有进程共享同一个库文件）
+DB_PATH = os.environ.get("CLAIMS_DB_PATH",
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "claims_data.db"))
+
+# 固定取值
+CAR_BRANDS = ["奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚", "福特"]
+CAR_MODELS = ["A4L", "3系", "C级", "凯美瑞", "雅阁", "天籁", "朗逸", "轩逸", "卡罗拉", "速腾"]
+CLAIM_TYPES = ["车辆碰撞", "自然灾害", "盗抢", "自燃", "涉水", "玻璃破损", "轮胎损坏", "划痕"]
+CLAIM_STATUSES = ["待审核", "审核中", "已批准", "已拒绝", "已结案"]
+HANDLERS = ["王处理员", "李审核员", "张专员", "赵主管", "钱经理"]
+
+# 生成示例数据用的取值和分布，权重与对应取值列表逐项对应
+OWNER_NAMES = ["张三", "李四", "王五", "赵六", "钱七", "孙八", "周九", "吴十",
+               "郑十一", "王十二", "陈十三", "褚十四", "卫十五", "蒋十六", "沈十七"]
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "南京", "成都", "武汉", "西安", "天津"]
+DISTRICTS = ["朝阳", "海淀", "西城", "东城", "丰台"]
+ROADS = ["中山", "建国", "长安", "民族", "和平"]
+PLATE_PROVINCES = ["京", "沪", "粤", "浙", "苏"]
+CAR_BRAND_WEIGHTS = [0.09, 0.09, 0.08, 0.16, 0.15, 0.12, 0.1, 0.08, 0.06, 0.07]
+CLAIM_TYPE_WEIGHTS = [0.34, 0.04, 0.02, 0.01, 0.04, 0.14, 0.11, 0.3]
+CLAIM_STATUS_WEIGHTS = [0.12, 0.18, 0.36, 0.1, 0.24]
+CLAIM_AMOUNT_MEDIANS = {"车辆碰撞": 8000, "自然灾害": 15000, "盗抢": 80000, "自燃": 50000,
+                        "涉水": 12000, "玻璃破损": 2000, "轮胎损坏": 1500, "划痕": 1200}
+
+# 表结构
+OWNER_SCHEMA = {
+    "车主编号": "TEXT PRIMARY KEY",
+    "姓名": "TEXT",
+    "身份证号": "TEXT",
+    "电话号码": "TEXT",
+    "邮箱": "TEXT",
+    "地址": "TEXT",
+    "车牌号": "TEXT",
+    "车辆品牌": "TEXT",
+    "车辆型号": "TEXT",
+    "购买日期": "TEXT",
+    "保险到期日": "TEXT",
+    "注册时间": "TEXT"
+}
+CLAIM_SCHEMA = {
+    "索赔编号": "TEXT PRIMARY KEY",
+    "车主编号": "TEXT",
+    "索赔类型": "TEXT",
+    "事故日期": "TEXT",
+    "申请日期": "TEXT",
+    "索赔金额": "INTEGER",
+    "批准金额": "INTEGER",
+    "处理状态": "TEXT",
+    "事故描述": "TEXT",
+    "处理备注": "TEXT",
+    "处理人员": "TEXT",
+    "创建时间": "TEXT",
+    "更新时间": "TEXT"
+}
+
+# 库中日期列的存储格式
+STORAGE_DATE_FORMATS = {
+    "购买日期": "%Y-%m-%d",
+    "保险到期日": "%Y-%m-%d",
+    "注册时间": "%Y-%m-%d %H:%M:%S",
+    "事故日期": "%Y-%m-%d",
+    "申请日期": "%Y-%m-%d",
+    "创建时间": "%Y-%m-%d %H:%M:%S",
+    "更新时间": "%Y-%m-%d %H:%M:%S"
+}
+
+# 内存中的列类型：库中按字符串保存，日期列在加载或写入时解析一次，
+# 低基数文本列使用分类类型
+OWNER_DTYPES = {
+    "车辆品牌": pd.CategoricalDtype(CAR_BRANDS),
+    "车辆型号": pd.CategoricalDtype(CAR_MODELS),
+    "购买日期": "datetime64[ns]",
+    "保险到期日": "datetime64[ns]",
+    "注册时间": "datetime64[ns]"
+}
+CLAIM_DTYPES = {
+    "索赔类型": pd.CategoricalDtype(CLAIM_TYPES),
+    "处理状态": pd.CategoricalDtype(CLAIM_STATUSES),
+    "处理人员": pd.CategoricalDtype(HANDLERS),
+    "事故日期": "datetime64[ns]",
+    "申请日期": "datetime64[ns]",
+    "创建时间": "datetime64[ns]",
+    "更新时间": "datetime64[ns]"
+}
+
+# 支持子串检索的列 -> 值的字母前缀；编号和电话号码由固定前缀加数字组成，按数字后缀建索引，
+# 为None的列按单字和二字建倒排索引
+OWNER_SEARCH_COLUMNS = {"车主编号": "OW", "姓名": None, "车牌号": None, "电话号码": ""}
+CLAIM_SEARCH_COLUMNS = {"索赔编号": "CL", "车主编号": "OW"}
+
+# 金额范围筛选：(下限(不含), 上限(含))
+AMOUNT_RANGES = {
+    "0-5000": (None, 5000),
+    "5000-20000": (5000, 20000),
+    "20000-50000": (20000, 50000),
+    "50000以上": (50000, None)
+}
+
+# 列表分页可选的每页条数
+PAGE_SIZES = [20, 50, 100]
+
+# 每类图表缓存的图表对象数，超出后淘汰最久未用的
+FIGURE_CACHE_ENTRIES = 16
+
+# 建立有序索引的列，用于区间查询和取最新记录
+CLAIM_SORTED_COLUMNS = ["申请日期", "索赔金额", "创建时间", "更新时间"]
+
+# 导出时每次写入的行数；导出文件超过 EXPORT_SPOOL_SIZE 字节后落到临时文件
+EXPORT_CHUNK_ROWS = 50000
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+# 后台导出线程数；保留的已结束导出任务数（相同请求直接复用其文件）；任务进行中时页面的刷新间隔（秒）
+EXPORT_WORKERS = 2
+EXPORT_JOB_LIMIT = 16
+EXPORT_POLL_SECONDS = 1
+
+# 导出格式 -> (扩展名, mime)；列式格式需要安装 pyarrow
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.csv)": ("csv", "text/csv"),
+    "Parquet (.parquet)": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC (.arrow)": ("arrow", "application/vnd.apache.arrow.file")
+}
+COLUMNAR_FORMATS = ["Parquet (.parquet)", "Arrow IPC (.arrow)"]
+
+# 列式格式可选的压缩方式（Arrow IPC 只支持 zstd 和 lz4）
+EXPORT_COMPRESSIONS = {
+    "Parquet (.parquet)": ["zstd", "snappy", "gzip", "none"],
+    "Arrow IPC (.arrow)": ["zstd", "lz4", "none"]
+}
+
+# 追加缓冲达到该行数时合并进主表
+APPEND_BUFFER_SIZE = 1000
+
+# 每个进程一次预留的编号数量
+ID_BLOCK_SIZE = 20
+
+# 批量导入时每次读取和校验的行数
+IMPORT_CHUNK_ROWS = 50000
+
+# 生成测试数据时每块的行数
+GENERATE_CHUNK_ROWS = 200000
+
+# 性能监控：每项保留的最近耗时样本数；剖析报告（cProfile）列出的函数数
+PERF_WINDOW = 500
+PROFILE_TOP_N = 40
+
+# 每个耗时样本以JSON写入该日志的 DEBUG 级别
+PERF_LOGGER = logging.getLogger("claims.perf")
+
+# 基准测试：默认的数据规模（索赔条数，车主数为其五分之一）、各用例重复次数，
+# 比基线慢多少倍算作退化
+BENCH_SIZES = [1000, 100000]
+BENCH_REPEAT = 5
+BENCH_THRESHOLD = 1.25
+
+# 批量导入的格式校验
+ID_CARD_PATTERN = re.compile(r"\d{17}[\dXx]")
+PHONE_PATTERN = re.compile(r"1\d{10}")
+PLATE_PATTERN = re.compile(r"[\u4e00-\u9fa5][A-Z][A-Z0-9]{5,6}")
+
+
+def _texts(values):
+    """整数数组转为字符串数组"""
+    return pd.Series(values).astype(str).to_numpy(dtype=object)
+
+
+def _pick(rng, values, size, p=None):
+    """按权重 p 从 values 中有放回地抽取"""
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _date_texts(today, days):
+    """today 加 days 天的日期字符串；不同的天数不多，先格式化每个天数再按下标取"""
+    low = int(days.min())
+    table = (today + pd.to_timedelta(np.arange(low, int(days.max()) + 1), unit="D")).strftime("%Y-%m-%d")
+    return table.to_numpy(dtype=object)[days - low]
+
+
+@functools.lru_cache(maxsize=1)
+def _time_texts():
+    """一天内每一秒的 HH:MM:SS 字符串"""
+    return np.array([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)], dtype=object)
+
+
+def _datetime_texts(today, days, seconds):
+    return _date_texts(today, days) + " " + _time_texts()[seconds]
+
+
+def _generate_owners(rng, start, count, today):
+    """生成编号从 start + 1 起的 count 个车主（存储形式）"""
+    numbers = np.arange(start + 1, start + count + 1)
+    return pd.DataFrame({
+        "车主编号": "OW" + pd.Series(numbers).astype(str).str.zfill(6).to_numpy(dtype=object),
+        "姓名": _pick(rng, OWNER_NAMES, count) + _texts(rng.integers(1, 1000, count)),
+        "身份证号": (_texts(rng.integers(110000, 660000, count)) + _texts(rng.integers(1955, 2005, count))
+                 + pd.Series(rng.integers(1, 13, count)).astype(str).str.zfill(2).to_numpy(dtype=object)
+                 + pd.Series(rng.integers(1, 29, count)).astype(str).str.zfill(2).to_numpy(dtype=object)
+                 + _texts(rng.integers(1000, 10000, count))),
+        "电话号码": "1" + _texts(rng.integers(30, 100, count)) + _texts(rng.integers(10000000, 100000000, count)),
+        "邮箱": "user" + _texts(numbers) + "@example.com",
+        "地址": (_pick(rng, CITIES, count) + "市" + _pick(rng, DISTRICTS, count) + "区"
+               + _pick(rng, ROADS, count) + "路" + _texts(rng.integers(1, 1000, count)) + "号"),
+        "车牌号": (_pick(rng, PLATE_PROVINCES, count) + _pick(rng, [chr(c) for c in range(65, 91)], count)
+                + _texts(rng.integers(10000, 100000, count))),
+        "车辆品牌": _pick(rng, CAR_BRANDS, count, CAR_BRAND_WEIGHTS),
+        "车辆型号": _pick(rng, CAR_MODELS, count),
+        "购买日期": _date_texts(today, -rng.integers(30, 1826, count)),
+        "保险到期日": _date_texts(today, rng.integers(30, 366, count)),
+        "注册时间": _datetime_texts(today, -rng.integers(1, 366, count), rng.integers(0, 86400, count))
+    })
+
+
+def _generate_claims(rng, start, count, owner_cdf, today):
+    """生成编号从 start + 1 起的 count 条索赔（存储形式），按 owner_cdf 的累积分布选择车主"""
+    numbers = np.arange(start + 1, start + count + 1)
+    owners = np.searchsorted(owner_cdf, rng.random(count) * owner_cdf[-1], side="right")
+    types = rng.choice(len(CLAIM_TYPES), size=count, p=CLAIM_TYPE_WEIGHTS)
+    statuses = rng.choice(len(CLAIM_STATUSES), size=count, p=CLAIM_STATUS_WEIGHTS)
+
+    # 金额按索赔类型的中位数做对数正态分布
+    medians = np.array([CLAIM_AMOUNT_MEDIANS[claim_type] for claim_type in CLAIM_TYPES])
+    amounts = np.clip(medians[types] * rng.lognormal(0, 0.6, count), 200, 500000).round(-1).astype(np.int64)
+    # 批准和结案的索赔约三分之二全额赔付，其余部分赔付；未批准的批准金额为0
+    paid = np.isin(np.asarray(CLAIM_STATUSES)[statuses], ["已批准", "已结案"])
+    ratio = np.where(rng.random(count) < 2 / 3, 1.0, rng.uniform(0.3, 1.0, count))
+    approved = np.where(paid, (amounts * ratio).astype(np.int64), 0)
+
+    # 事故后几天内申请，申请当天工作时间内创建，之后一个月内更新，都不晚于今天
+    accident_days = -rng.integers(1, 366, count)
+    apply_days = np.minimum(accident_days + rng.geometric(0.3, count) - 1, 0)
+    create_seconds = rng.integers(8 * 3600, 18 * 3600, count)
+    update_days = np.minimum(apply_days + rng.integers(0, 31, count), 0)
+    update_seconds = rng.integers(0, 86400, count)
+    update_seconds = np.where(update_days == apply_days, np.maximum(update_seconds, create_seconds), update_seconds)
+
+    type_names = np.asarray(CLAIM_TYPES, dtype=object)[types]
+    status_names = np.asarray(CLAIM_STATUSES, dtype=object)[statuses]
+    return pd.DataFrame({
+        "索赔编号": "CL" + pd.Series(numbers).astype(str).str.zfill(6).to_numpy(dtype=object),
+        "车主编号": "OW" + pd.Series(owners + 1).astype(str).str.zfill(6).to_numpy(dtype=object),
+        "索赔类型": type_names,
+        "事故日期": _date_texts(today, accident_days),
+        "申请日期": _date_texts(today, apply_days),
+        "索赔金额": amounts,
+        "批准金额": approved,
+        "处理状态": status_names,
+        "事故描述": "在" + _pick(rng, CITIES, count) + "市发生" + type_names + "事故，造成车辆不同程度损坏。",
+        "处理备注": np.where(np.isin(status_names, ["待审核", "审核中"]), "正在处理中...", "已完成处理").astype(object),
+        "处理人员": _pick(rng, HANDLERS, count),
+        "创建时间": _datetime_texts(today, apply_days, create_seconds),
+        "更新时间": _datetime_texts(today, update_days, update_seconds)
+    })
+
+
+def iter_generated_data(n_owners, n_claims, seed=None, today=None, chunk_rows=GENERATE_CHUNK_ROWS):
+    """按块生成车主和索赔数据（存储形式），依次产出 ("owners", 块) 和 ("claims", 块)
+
+    每块使用由 (seed, 表, 块序号) 派生的随机数发生器，seed 和 today 相同时结果完全一致；
+    日期都相对 today（默认今天）生成。索赔按对数正态分布的权重分配给车主，少数车主索赔较多。
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    today = pd.Timestamp(today or datetime.now().date()).normalize()
+    for chunk, start in enumerate(range(0, n_owners, chunk_rows)):
+        rng = np.random.default_rng([seed, 0, chunk])
+        yield "owners", _generate_owners(rng, start, min(chunk_rows, n_owners - start), today)
+    if n_claims and n_owners:
+        owner_cdf = np.cumsum(np.random.default_rng([seed, 1]).lognormal(0, 1, n_owners))
+        for chunk, start in enumerate(range(0, n_claims, chunk_rows)):
+            rng = np.random.default_rng([seed, 2, chunk])
+            yield "claims", _generate_claims(rng, start, min(chunk_rows, n_claims - start), owner_cdf, today)
+
+
+def generate_sample_data(n_owners=50, n_claims=120, seed=None, today=None):
     """生成示例数据"""
-    # 生成车主信息示例数据
-    owner_names = ["张三", "李四", "王五", "赵六", "钱七", "孙八", "周九", "吴十",
-                   "郑十一", "王十二", "陈十三", "褚十四", "卫十五", "蒋十六", "沈十七"]
-
-    cities = ["北京", "上海", "广州", "深圳", "杭州", "南京", "成都", "武汉", "西安", "天津"]
-    car_brands = ["奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚", "福特"]
-    car_models = ["A4L", "3系", "C级", "凯美瑞", "雅阁", "天籁", "朗逸", "轩逸", "卡罗拉", "速腾"]
-
-    # 车主数据
-    owners_data = []
-    for i in range(50):
-        owner_id = f"OW{str(i + 1).zfill(6)}"
-        owners_data.append({
-            "车主编号": owner_id,
-            "姓名": random.choice(owner_names) + str(random.randint(1, 999)),
-            "身份证号": f"{random.randint(110000, 999999)}{random.randint(1950, 2005)}{random.randint(1, 12):02d}{random.randint(1, 28):02d}{random.randint(1000, 9999)}",
-            "电话号码": f"1{random.randint(3, 9)}{random.randint(0, 9)}{random.randint(10000000, 99999999)}",
-            "邮箱": f"user{i + 1}@example.com",
-            "地址": f"{random.choice(cities)}市{random.choice(['朝阳', '海淀', '西城', '东城', '丰台'])}区{random.choice(['中山', '建国', '长安', '民族', '和平'])}路{random.randint(1, 999)}号",
-            "车牌号": f"{random.choice(['京', '沪', '粤', '浙', '苏'])}{chr(random.randint(65, 90))}{random.randint(10000, 99999)}",
-            "车辆品牌": random.choice(car_brands),
-            "车辆型号": random.choice(car_models),
-            "购买日期": (datetime.now() - timedelta(days=random.randint(30, 1825))).strftime("%Y-%m-%d"),
-            "保险到期日": (datetime.now() + timedelta(days=random.randint(30, 365))).strftime("%Y-%m-%d"),
-            "注册时间": (datetime.now() - timedelta(days=random.randint(1, 365))).strftime("%Y-%m-%d %H:%M:%S")
-        })
-
-    # 索赔数据
-    claim_types = ["车辆碰撞", "自然灾害", "盗抢", "自燃", "涉水", "玻璃破损", "轮胎损坏", "划痕"]
-    claim_status = ["待审核", "审核中", "已批准", "已拒绝", "已结案"]
-
-    claims_data = []
-    for i in range(120):
-        claim_id = f"CL{str(i + 1).zfill(6)}"
-        owner_id = random.choice([owner["车主编号"] for owner in owners_data])
-        claim_amount = random.randint(500, 50000)
-        approved_amount = claim_amount if random.choice([True, False, True]) else random.randint(0, claim_amount)
-
-        claims_data.append({
-            "索赔编号": claim_id,
-            "车主编号": owner_id,
-            "索赔类型": random.choice(claim_types),
-            "事故日期": (datetime.now() - timedelta(days=random.randint(1, 365))).strftime("%Y-%m-%d"),
-            "申请日期": (datetime.now() - timedelta(days=random.randint(1, 90))).strftime("%Y-%m-%d"),
-            "索赔金额": claim_amount,
-            "批准金额": approved_amount,
-            "处理状态": random.choice(claim_status),
-            "事故描述": f"在{random.choice(cities)}市发生{random.choice(claim_types)}事故，造成车辆不同程度损坏。",
-            "处理备注": "正在处理中..." if random.choice([True, False]) else "已完成处理",
-            "处理人员": random.choice(["王处理员", "李审核员", "张专员", "赵主管", "钱经理"]),
-            "创建时间": (datetime.now() - timedelta(days=random.randint(1, 90))).strftime("%Y-%m-%d %H:%M:%S"),
-            "更新时间": (datetime.now() - timedelta(days=random.randint(0, 30))).strftime("%Y-%m-%d %H:%M:%S")
-        })
-
-    return pd.DataFrame(owners_data), pd.DataFrame(claims_data)
+    frames = {"owners": [], "claims": []}
+    for table, chunk in iter_generated_data(n_owners, n_claims, seed, today):
+        frames[table].append(chunk)
+    owners_data = pd.concat(frames["owners"], ignore_index=True) if frames["owners"] else pd.DataFrame(
+        columns=list(OWNER_SCHEMA))
+    claims_data = pd.concat(frames["claims"], ignore_index=True) if frames["claims"] else pd.DataFrame(
+        columns=list(CLAIM_SCHEMA))
+    return owners_data, claims_data
+
+
+def to_category(series, dtype):
+    """转换为分类类型，固定取值之外的值追加为新类别而不是变成缺失值"""
+    extra = pd.Index(series.dropna().unique()).difference(dtype.categories)
+    if len(extra) > 0:
+        dtype = pd.CategoricalDtype(list(dtype.categories) + list(extra))
+    return series.astype(dtype)
+
+
+def apply_dtypes(df, dtypes):
+    """按列类型转换DataFrame（原地修改并返回）"""
+    for col, dtype in dtypes.items():
+        if col in df.columns:
+            if dtype == "datetime64[ns]":
+                df[col] = pd.to_datetime(df[col], format="ISO8601")
+            elif isinstance(dtype, pd.CategoricalDtype):
+                df[col] = to_category(df[col], dtype)
+            else:
+                df[col] = df[col].astype(dtype)
+    return df
+
+
+def to_storage(df):
+    """转为库中的存储形式：日期列按 STORAGE_DATE_FORMATS 格式化为字符串，缺失值为None"""
+    df = df.copy()
+    for col, date_format in STORAGE_DATE_FORMATS.items():
+        if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime(date_format)
+    df = df.astype(object)
+    return df.where(df.notna(), None)
+
+
+def coerce_values(values, dtypes):
+    """把单行的字段值转换为对应列类型"""
+    return {col: pd.Timestamp(value) if dtypes.get(col) == "datetime64[ns]" and value is not None else value
+            for col, value in values.items()}
+
+
+class NgramIndex:
+    """子串检索用的倒排索引
+
+    每个值按单字和相邻二字建立倒排表。单字编码为其码位，二字编码为 (首字码位 << 21) | 次字码位；
+    倒排表存为整数数组：_keys 为排序去重后的编码，_positions[_offsets[i]:_offsets[i + 1]] 为含 _keys[i] 的行位置（升序）。
+    加载和批量追加时向量化建立，单条新增和修改先暂存，下次查询前合并。
+    查询取查询串各二字倒排表的交集作为候选，再确认候选确实包含查询串；单字、二字查询直接读倒排表。
+    查询时会合并暂存的修改，读写都在索引自己的锁内进行。
+    """
+
+    def __init__(self, values):
+        self._lock = threading.RLock()
+        self._values = []
+        self._keys = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._positions = np.empty(0, dtype=np.int32)
+        # 已合并进倒排表的行数；暂存的新增 {行位置: 值} 和待删除的旧值 {行位置: 值}
+        self._merged = 0
+        self._pending = {}
+        self._removed = {}
+        self.extend(0, values)
+
+    @staticmethod
+    def _text(value):
+        return None if value is None or pd.isna(value) else str(value)
+
+    @staticmethod
+    def _encode(gram):
+        return ord(gram) if len(gram) == 1 else ord(gram[0]) << 21 | ord(gram[1])
+
+    @staticmethod
+    def _gram_pairs(texts, rows):
+        """各值的单字、二字编码及所在行位置，按 (编码, 行位置) 排序并去重"""
+        texts = pd.Series(texts, dtype=object)
+        lengths = texts.str.len().fillna(0).to_numpy(dtype=np.int64)
+        keys, positions = [], []
+        # 按长度分组转成定长字符数组，一个超长的值不会放大整列
+        for length in np.unique(lengths[lengths > 0]):
+            mask = lengths == length
+            codes = np.array(texts[mask].tolist(), dtype=f"<U{length}").view(np.uint32).reshape(-1, length)
+            codes = codes.astype(np.int64)
+            grams = np.concatenate([codes, codes[:, :-1] << 21 | codes[:, 1:]], axis=1)
+            keys.append(grams.ravel())
+            positions.append(np.repeat(rows[mask], grams.shape[1]))
+        if not keys:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        keys, positions = np.concatenate(keys), np.concatenate(positions)
+        order = np.lexsort((positions, keys))
+        keys, positions = keys[order], positions[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (positions[1:] != positions[:-1])
+        return keys[keep], positions[keep].astype(np.int32)
+
+    def _segment_at(self, key, row):
+        """(key, row) 在 _positions 中的位置，key 须已在倒排表中"""
+        k = np.searchsorted(self._keys, key)
+        start, end = self._offsets[k], self._offsets[k + 1]
+        return start + np.searchsorted(self._positions[start:end], row)
+
+    def _insert_pairs(self, keys, rows):
+        """插入按 (编码, 行位置) 排序的倒排项"""
+        k = np.searchsorted(self._keys, keys)
+        exists = np.zeros(len(keys), dtype=bool)
+        inside = k < len(self._keys)
+        exists[inside] = self._keys[k[inside]] == keys[inside]
+        # 新行的位置大于已有的全部行，排在各倒排表末尾；修改过的行要插到倒排表中间
+        at = self._offsets[k + exists]
+        for i in np.flatnonzero(exists & (rows < self._merged)):
+            at[i] = self._segment_at(keys[i], rows[i])
+        self._positions = np.insert(self._positions, at, rows)
+        counts = np.diff(self._offsets)
+        np.add.at(counts, k[exists], 1)
+        new_keys, new_counts = np.unique(keys[~exists], return_counts=True)
+        at = np.searchsorted(self._keys, new_keys)
+        self._keys = np.insert(self._keys, at, new_keys)
+        self._offsets = np.concatenate([[0], np.cumsum(np.insert(counts, at, new_counts))])
+
+    def _delete_pairs(self, keys, rows):
+        """删除已在倒排表中的倒排项"""
+        at = np.fromiter((self._segment_at(key, row) for key, row in zip(keys, rows)), dtype=np.int64,
+                         count=len(keys))
+        self._positions = np.delete(self._positions, at)
+        counts = np.diff(self._offsets)
+        np.subtract.at(counts, np.searchsorted(self._keys, keys), 1)
+        self._keys = self._keys[counts > 0]
+        self._offsets = np.concatenate([[0], np.cumsum(counts[counts > 0])])
+
+    def _merge(self):
+        if self._removed:
+            rows = sorted(self._removed)
+            self._delete_pairs(*self._gram_pairs([self._removed[pos] for pos in rows], np.array(rows)))
+            self._removed = {}
+        if self._pending:
+            rows = sorted(self._pending)
+            self._insert_pairs(*self._gram_pairs([self._pending[pos] for pos in rows], np.array(rows)))
+            self._pending = {}
+        self._merged = len(self._values)
+
+    def extend(self, start, values):
+        """批量追加从行位置 start 起的值"""
+        texts = [self._text(value) for value in values]
+        pairs = self._gram_pairs(texts, np.arange(start, start + len(texts)))
+        with self._lock:
+            self._merge()
+            self._values.extend(texts)
+            self._insert_pairs(*pairs)
+            self._merged = len(self._values)
+
+    def add(self, pos, value):
+        text = self._text(value)
+        with self._lock:
+            if pos == len(self._values):
+                self._values.append(text)
+            else:
+                self._values[pos] = text
+            if text is not None:
+                self._pending[pos] = text
+
+    def remove(self, pos, value):
+        """删除行位置 pos 上的值 value"""
+        with self._lock:
+            if self._pending.pop(pos, None) is None and pos < self._merged and self._text(value) is not None:
+                self._removed.setdefault(pos, self._text(value))
+            self._values[pos] = None
+
+    def _posting(self, gram):
+        key = self._encode(gram)
+        k = np.searchsorted(self._keys, key)
+        if k == len(self._keys) or self._keys[k] != key:
+            return np.empty(0, dtype=np.int32)
+        return self._positions[self._offsets[k]:self._offsets[k + 1]]
+
+    def search(self, query):
+        """返回值中包含 query 的行位置（升序）"""
+        grams = {query} if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+        with self._lock:
+            self._merge()
+            postings = sorted((self._posting(gram) for gram in grams), key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                if not len(candidates):
+                    break
+                at = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+                candidates = candidates[posting[at] == candidates]
+            if len(query) > 2:
+                candidates = candidates[np.fromiter((query in self._values[pos] for pos in candidates),
+                                                    dtype=bool, count=len(candidates))]
+            return candidates
+
+
+class DigitSearchIndex:
+    """由固定字母前缀加数字组成的值（如编号 OW000123、电话号码）的子串检索索引
+
+    数字部分按后缀长度分组，长度为 k 的后缀即数字部分的末 k 位，每组用 SortedIndex 按数值保存；
+    完整的数字部分单独成组。纯数字的查询串出现在某个值中，当且仅当它是该值数字部分某个后缀的前缀，
+    每组一次二分查找即可取出全部匹配；带前缀字母的查询串只能从值的开头匹配，只查完整数字部分的组。
+    不符合格式的值单独保存，查询时逐个比较。读写都在索引自己的锁内进行。
+    """
+
+    def __init__(self, values, prefix):
+        self._lock = threading.RLock()
+        self.prefix = prefix
+        self._pattern = re.compile(re.escape(prefix) + r"(\d{1,18})", re.ASCII)
+        # (后缀长度, 是否完整的数字部分) -> SortedIndex
+        self._groups = {}
+        self._others = {}
+        self.extend(0, values)
+
+    @staticmethod
+    def _dtype(length):
+        return np.int32 if length <= 9 else np.int64
+
+    def _group(self, length, full):
+        if (length, full) not in self._groups:
+            self._groups[length, full] = SortedIndex(np.empty(0, dtype=self._dtype(length)),
+                                                     np.empty(0, dtype=np.int32))
+        return self._groups[length, full]
+
+    def _digits(self, value):
+        if value is None or pd.isna(value):
+            return None
+        match = self._pattern.fullmatch(str(value))
+        return None if match is None else match.group(1)
+
+    def extend(self, start, values):
+        """批量追加从行位置 start 起的值"""
+        # 直接对字符串 fullmatch，比 Series.str.extract 快数倍
+        values = list(values)
+        fullmatch = self._pattern.fullmatch
+        matches = [fullmatch(value) if isinstance(value, str) else None for value in values]
+        matched = np.array([m is not None for m in matches], dtype=bool)
+        digits = [m.group(1) for m in matches if m is not None]
+        rows = np.flatnonzero(matched).astype(np.int32) + start
+        widths = np.fromiter(map(len, digits), dtype=np.int64, count=len(digits))
+        numbers = np.array(digits, dtype=object).astype(np.int64) if digits else np.empty(0, dtype=np.int64)
+        with self._lock:
+            for pos in np.flatnonzero(~matched):
+                if values[pos] is not None and not pd.isna(values[pos]):
+                    self._others[start + int(pos)] = str(values[pos])
+            for length in range(1, widths.max() + 1 if len(widths) else 1):
+                for full in (True, False):
+                    mask = widths == length if full else widths > length
+                    if mask.any():
+                        self._group(length, full).extend(numbers[mask] % 10 ** length, rows[mask])
+
+    def add(self, pos, value):
+        digits = self._digits(value)
+        with self._lock:
+            if digits is None:
+                if value is not None and not pd.isna(value):
+                    self._others[pos] = str(value)
+                return
+            for length in range(1, len(digits) + 1):
+                self._group(length, length == len(digits)).add(int(digits) % 10 ** length, pos)
+
+    def remove(self, pos, value):
+        """删除行位置 pos 上的值 value"""
+        digits = self._digits(value)
+        with self._lock:
+            if digits is None:
+                self._others.pop(pos, None)
+                return
+            for length in range(1, len(digits) + 1):
+                self._groups[length, length == len(digits)].remove(int(digits) % 10 ** length, pos)
+
+    def search(self, query):
+        """返回值中包含 query 的行位置（升序）"""
+        match = re.fullmatch(r"(\D*)(\d*)", query, re.ASCII)
+        with self._lock:
+            found = [np.array([pos for pos, text in self._others.items() if query in text], dtype=np.int64)]
+            if match is not None:
+                head, digits = match.groups()
+                if not digits:
+                    if head in self.prefix:
+                        found.extend(index.range() for (_, full), index in self._groups.items() if full)
+                elif not head or self.prefix.endswith(head):
+                    for (length, full), index in self._groups.items():
+                        if length >= len(digits) and (full or not head):
+                            # 边界转为该组的整数类型，否则二分查找前会把整组值转换一遍
+                            scale, dtype = 10 ** (length - len(digits)), self._dtype(length)
+                            found.append(index.range(dtype(int(digits) * scale),
+                                                     dtype((int(digits) + 1) * scale), high_inclusive=False))
+        return np.unique(np.concatenate(found))
+
+
+class SortedIndex:
+    """有序二级索引
+
+    保存按列值排序后的值和对应行位置，区间查询用二分查找，取最大的前N条直接从末尾读。
+    新增的值先暂存，下次查询前批量插入；修改的值用二分查找定位后原地移动，不重建索引。
+    查询也会合并暂存的值，读写都在索引自己的锁内进行，多个会话可以同时查询和修改。
+    """
+
+    def __init__(self, values, positions=None):
+        order = np.argsort(values, kind="stable")
+        self._lock = threading.RLock()
+        self._values = values[order]
+        # positions 为各值所在的行位置，默认依次为 0, 1, 2, ...
+        self._positions = order if positions is None else positions[order]
+        self._pending = []
+
+    def add(self, value, pos):
+        with self._lock:
+            self._pending.append((value, pos))
+
+    def remove(self, value, pos):
+        """删除行位置 pos 上的值 value"""
+        with self._lock:
+            self._merge()
+            value = np.array([value]).astype(self._values.dtype)[0]
+            start = np.searchsorted(self._values, value, side="left")
+            end = np.searchsorted(self._values, value, side="right")
+            at = start + np.flatnonzero(self._positions[start:end] == pos)[0]
+            self._values = np.delete(self._values, at)
+            self._positions = np.delete(self._positions, at)
+
+    def move(self, old_value, new_value, pos):
+        """行位置 pos 上的值由 old_value 改为 new_value"""
+        with self._lock:
+            self.remove(old_value, pos)
+            self.add(new_value, pos)
+
+    def extend(self, values, positions):
+        """批量插入"""
+        with self._lock:
+            self._merge()
+            self._insert(np.asarray(values).astype(self._values.dtype), np.asarray(positions))
+
+    def _insert(self, values, positions):
+        order = np.argsort(values, kind="stable")
+        at = np.searchsorted(self._values, values[order], side="right")
+        self._values = np.insert(self._values, at, values[order])
+        self._positions = np.insert(self._positions, at, positions[order])
+
+    def _merge(self):
+        if self._pending:
+            values = np.array([value for value, _ in self._pending]).astype(self._values.dtype)
+            positions = np.array([pos for _, pos in self._pending])
+            self._pending = []
+            self._insert(values, positions)
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """值在区间内的行位置（升序），None表示不限"""
+        with self._lock:
+            self._merge()
+            values, positions = self._values, self._positions
+        start = 0 if low is None else np.searchsorted(values, low, side="left" if low_inclusive else "right")
+        end = len(values) if high is None else np.searchsorted(
+            values, high, side="right" if high_inclusive else "left")
+        return np.sort(positions[start:end])
+
+    def descending(self):
+        """按值从大到小排列的行位置"""
+        with self._lock:
+            self._merge()
+            return self._positions[::-1]
+
+
+class BufferedTable:
+    """带追加缓冲和主键索引的DataFrame
+
+    新增行先放入缓冲列表，读取整表或缓冲达到 buffer_size 时才合并一次，
+    避免每次插入都复制整张表。
+    """
+
+    def __init__(self, frame, key_column, dtypes, search_columns=(), sorted_columns=(),
+                 buffer_size=APPEND_BUFFER_SIZE):
+        self.key_column = key_column
+        self.dtypes = dtypes
+        self.columns = list(frame.columns)
+        self.buffer_size = buffer_size
+        self._lock = threading.RLock()
+        self._frame = apply_dtypes(frame, dtypes)
+        self._pending = []
+        # 主键索引：编号 -> 行位置
+        self._index = dict(zip(frame[key_column], range(len(frame))))
+        # 子串检索索引：列名 -> NgramIndex 或 DigitSearchIndex
+        self._search_indexes = {col: NgramIndex(frame[col]) if prefix is None else DigitSearchIndex(frame[col], prefix)
+                                for col, prefix in dict(search_columns).items()}
+        # 有序索引：列名 -> SortedIndex，首次使用时建立
+        self._sorted_indexes = dict.fromkeys(sorted_columns)
+
+    def __len__(self):
+        return len(self._frame) + len(self._pending)
+
+    @property
+    def frame(self):
+        """合并缓冲后的完整DataFrame"""
+        if self._pending:
+            self.compact()
+        return self._frame
+
+    def compact(self):
+        """把缓冲中的新行一次性合并进主表"""
+        with self._lock:
+            if self._pending:
+                self._concat(apply_dtypes(pd.DataFrame(self._pending, columns=self.columns), self.dtypes))
+                self._pending = []
+
+    def _concat(self, frame):
+        """把已转换列类型的新行接到主表后，只处理新行，主表不重新转换"""
+        for col, dtype in self.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                # 两边类别不一致时concat会退化为object，先合并类别；追加类别不改动已有编码
+                column = self._frame[col]
+                extra = frame[col].cat.categories.difference(column.cat.categories)
+                if len(extra) > 0:
+                    column = self._frame[col] = column.cat.add_categories(extra)
+                frame[col] = frame[col].cat.set_categories(column.cat.categories)
+        self._frame = pd.concat([self._frame, frame], ignore_index=True)
+
+    def get(self, key):
+        """按主键取单条记录，不存在时返回None"""
+        with self._lock:
+            pos = self._index.get(key)
+            if pos is None:
+                return None
+            if pos >= len(self._frame):
+                return pd.Series(self._pending[pos - len(self._frame)], index=self.columns)
+            return self._frame.iloc[pos]
+
+    def sorted_index(self, column):
+        """column 的有序索引，该列未建索引时返回None"""
+        if column not in self._sorted_indexes:
+            return None
+        with self._lock:
+            if self._sorted_indexes[column] is None:
+                self._sorted_indexes[column] = SortedIndex(self.frame[column].to_numpy())
+            return self._sorted_indexes[column]
+
+    def search(self, column, text):
+        """返回 column 中包含 text 的记录"""
+        if not text:
+            return self.frame
+        positions = self._search_indexes[column].search(text)
+        return self.frame.iloc[positions]
+
+    def append(self, row):
+        with self._lock:
+            pos = len(self)
+            self._index[row[self.key_column]] = pos
+            for col, search_index in self._search_indexes.items():
+                search_index.add(pos, row.get(col))
+            values = coerce_values({col: row.get(col) for col in self.columns}, self.dtypes)
+            for col, sorted_index in self._sorted_indexes.items():
+                if sorted_index is not None:
+                    sorted_index.add(values[col], pos)
+            self._pending.append(values)
+            if len(self._pending) >= self.buffer_size:
+                self.compact()
+
+    def extend(self, frame):
+        """批量追加，frame 须包含全部列；有序索引在下次使用时重建"""
+        with self._lock:
+            self.compact()
+            start = len(self._frame)
+            frame = apply_dtypes(frame[self.columns].reset_index(drop=True), self.dtypes)
+            self._index.update(zip(frame[self.key_column], range(start, start + len(frame))))
+            for col, search_index in self._search_indexes.items():
+                search_index.extend(start, frame[col])
+            self._sorted_indexes = dict.fromkeys(self._sorted_indexes)
+            self._concat(frame)
+
+    def positions(self, keys):
+        """各主键的行位置，不存在的为-1"""
+        with self._lock:
+            return np.fromiter((self._index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+    def update(self, key, changes):
+        with self._lock:
+            self.compact()
+            pos = self._index[key]
+            for col in changes:
+                if col in self._search_indexes:
+                    self._search_indexes[col].remove(pos, self._frame.at[pos, col])
+                    self._search_indexes[col].add(pos, changes[col])
+            values = coerce_values(changes, self.dtypes)
+            for col, value in values.items():
+                if self._sorted_indexes.get(col) is not None:
+                    self._sorted_indexes[col].move(self._frame.at[pos, col], value, pos)
+            for col, value in values.items():
+                column = self._frame[col]
+                if isinstance(column.dtype, pd.CategoricalDtype) and value not in column.cat.categories:
+                    self._frame[col] = column.cat.add_categories([value])
+                self._frame.loc[pos, col] = value
+
+
+class IdAllocator:
+    """编号分配器
+
+    计数器持久化在 id_sequences 表中，每个进程按块预留编号后在内存中分配，
+    多进程部署下也不会产生重复编号，分配时无需扫描业务表。
+    """
+
+    def __init__(self, conn, lock, block_size=ID_BLOCK_SIZE):
+        self._conn = conn
+        self._lock = lock
+        self.block_size = block_size
+        # 前缀 -> [下一个可用值, 预留块结束值)
+        self._blocks = {}
+
+    def _reserve(self, prefix, count):
+        with self._conn:
+            # UPDATE 先拿到写锁，其他进程的预留会等待本事务提交
+            self._conn.execute("UPDATE id_sequences SET next_value = next_value + ? WHERE name = ?",
+                               (count, prefix))
+            end = self._conn.execute("SELECT next_value FROM id_sequences WHERE name = ?",
+                                     (prefix,)).fetchone()[0]
+        return [end - count, end]
+
+    def next_ids(self, prefix, count):
+        """分配 count 个连续编号"""
+        with self._lock:
+            block = self._blocks.get(prefix)
+            if block is None or block[1] - block[0] < count:
+                block = self._blocks[prefix] = self._reserve(prefix, max(count, self.block_size))
+            start = block[0]
+            block[0] += count
+        return [f"{prefix}{str(n).zfill(6)}" for n in range(start, start + count)]
+
+    def next_id(self, prefix):
+        return self.next_ids(prefix, 1)[0]
+
+
+class RunningStats:
+    """增量维护的统计计数器
+
+    加载时用 from_frames 全量计算一次，之后每次插入或更新只应用差量，
+    看板指标读取计数器即可，无需扫描整表。
+    """
+
+    def __init__(self):
+        self.total_owners = 0
+        self.total_claims = 0
+        self.total_claim_amount = 0
+        self.total_approved_amount = 0
+        # 索赔金额只在新增时写入，最大值只需随插入更新
+        self.max_claim_amount = 0
+        self.brand_counts = Counter()
+        self.type_counts = Counter()
+        self.type_amounts = Counter()
+        self.type_approved = Counter()
+        self.status_counts = Counter()
+        # 按车主汇总的索赔数和金额，车主修改品牌时整体迁移到新品牌，
+        # 品牌维度的索赔统计因此不需要关联车主表
+        self.owner_claim_counts = Counter()
+        self.owner_claim_amounts = Counter()
+        self.brand_claim_counts = Counter()
+        self.brand_claim_amounts = Counter()
+
+    @classmethod
+    def from_frames(cls, owners_data, claims_data):
+        """全量计算"""
+        stats = cls()
+        stats.add_owners(owners_data)
+        brands = claims_data["车主编号"].map(owners_data.set_index("车主编号")["车辆品牌"])
+        stats.add_claims(claims_data, brands)
+        return stats
+
+    def add_owners(self, owners):
+        """批量新增车主"""
+        self.total_owners += len(owners)
+        self.brand_counts.update(owners["车辆品牌"].value_counts().to_dict())
+
+    def add_claims(self, claims, brands):
+        """批量新增索赔，brands 为与 claims 逐行对应的车主品牌"""
+        amounts = claims["索赔金额"]
+        self.total_claims += len(claims)
+        self.total_claim_amount += int(amounts.sum())
+        self.total_approved_amount += int(claims["批准金额"].sum())
+        if len(claims):
+            self.max_claim_amount = max(self.max_claim_amount, int(amounts.max()))
+        self.type_counts.update(claims["索赔类型"].value_counts().to_dict())
+        self.type_amounts.update(
+            {k: int(v) for k, v in amounts.groupby(claims["索赔类型"], observed=True).sum().items()})
+        self.type_approved.update(claims.loc[claims["处理状态"] == "已批准", "索赔类型"].value_counts().to_dict())
+        self.status_counts.update(claims["处理状态"].value_counts().to_dict())
+
+        owner_groups = amounts.groupby(claims["车主编号"])
+        self.owner_claim_counts.update(owner_groups.size().to_dict())
+        self.owner_claim_amounts.update({k: int(v) for k, v in owner_groups.sum().items()})
+        brand_groups = amounts.groupby(np.asarray(brands), observed=True)
+        self.brand_claim_counts.update(brand_groups.size().to_dict())
+        self.brand_claim_amounts.update({k: int(v) for k, v in brand_groups.sum().items()})
+
+    def snapshot(self):
+        """去掉零计数后的全部计数，用于与全量计算结果比对"""
+        snapshot = {}
+        for name, value in vars(self).items():
+            snapshot[name] = +value if isinstance(value, Counter) else value
+        return snapshot
+
+    def _apply_claim(self, row, sign, brand):
+        claim_type = row["索赔类型"]
+        amount = int(row["索赔金额"])
+        self.owner_claim_counts[row["车主编号"]] += sign
+        self.owner_claim_amounts[row["车主编号"]] += sign * amount
+        if brand is not None:
+            self.brand_claim_counts[brand] += sign
+            self.brand_claim_amounts[brand] += sign * amount
+        self.total_claims += sign
+        self.total_claim_amount += sign * amount
+        self.total_approved_amount += sign * int(row["批准金额"])
+        self.type_counts[claim_type] += sign
+        self.type_amounts[claim_type] += sign * amount
+        self.status_counts[row["处理状态"]] += sign
+        if row["处理状态"] == "已批准":
+            self.type_approved[claim_type] += sign
+        if sign > 0:
+            self.max_claim_amount = max(self.max_claim_amount, amount)
+
+    def add_owner(self, row):
+        self.total_owners += 1
+        self.brand_counts[row["车辆品牌"]] += 1
+
+    def update_owner(self, old_row, changes):
+        if "车辆品牌" in changes:
+            old_brand, new_brand = old_row["车辆品牌"], changes["车辆品牌"]
+            owner_id = old_row["车主编号"]
+            self.brand_counts[old_brand] -= 1
+            self.brand_counts[new_brand] += 1
+            self.brand_claim_counts[old_brand] -= self.owner_claim_counts[owner_id]
+            self.brand_claim_counts[new_brand] += self.owner_claim_counts[owner_id]
+            self.brand_claim_amounts[old_brand] -= self.owner_claim_amounts[owner_id]
+            self.brand_claim_amounts[new_brand] += self.owner_claim_amounts[owner_id]
+
+    def add_claim(self, row, brand):
+        """brand 为该索赔所属车主的车辆品牌"""
+        self._apply_claim(row, 1, brand)
+
+    def update_claim(self, old_row, changes, brand):
+        # 索赔不会更换所属车主，前后使用同一个品牌
+        new_row = dict(old_row)
+        new_row.update(changes)
+        self._apply_claim(old_row, -1, brand)
+        self._apply_claim(new_row, 1, brand)
+
+
+def counter_series(counter):
+    """计数器转为按数值降序排列的Series，与 value_counts 的结果一致"""
+    series = pd.Series({key: value for key, value in counter.items() if value}, dtype="int64")
+    return series.sort_values(ascending=False)
+
+
+class ClaimsRepository:
+    """车主/索赔数据仓库
+
+    数据持久化在SQLite（WAL模式）中，每个进程只加载一份DataFrame供所有会话共享。
+    其他进程提交的修改通过 PRAGMA data_version 检测，按 rowid 读取新增的行、按 changes 修改日志
+    读取被修改的行，增量应用到内存数据，不重新加载整表。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self.create_tables(self._conn)
+        self._ids = IdAllocator(self._conn, self._lock)
+        self._data_version = None
+        # 已读到的各表最大 rowid 和修改日志序号，增量读取从这里继续
+        self._last_rowids = {}
+        self._last_change = 0
+        # 内存数据版本号，每次写入或重新加载后递增，用作聚合缓存的键
+        self.version = 0
+        self.owners = None
+        self.claims = None
+        self.stats = None
+        self.refresh()
+
+    @staticmethod
+    def create_tables(conn, sample_data=True):
+        """建表，空库且 sample_data 为真时写入示例数据"""
+        with conn:
+            for table, schema in (("owners", OWNER_SCHEMA), ("claims", CLAIM_SCHEMA)):
+                columns = ", ".join(f'"{col}" {col_type}' for col, col_type in schema.items())
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+
+            if sample_data and conn.execute("SELECT COUNT(*) FROM owners").fetchone()[0] == 0:
+                owners_df, claims_df = generate_sample_data()
+                ClaimsRepository.insert_rows(conn, "owners", OWNER_SCHEMA, owners_df)
+                ClaimsRepository.insert_rows(conn, "claims", CLAIM_SCHEMA, claims_df)
+
+            # 修改日志：每次修改记录表名和主键，其他进程据此增量同步
+            conn.execute("CREATE TABLE IF NOT EXISTS changes "
+                         "(seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT, key TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS id_sequences (name TEXT PRIMARY KEY, next_value INTEGER)")
+            for prefix, table, key_column in (("OW", "owners", "车主编号"), ("CL", "claims", "索赔编号")):
+                if conn.execute("SELECT 1 FROM id_sequences WHERE name = ?", (prefix,)).fetchone() is None:
+                    # 首次建立计数器时从已有最大编号继续
+                    max_value = conn.execute(
+                        f'SELECT MAX(CAST(SUBSTR("{key_column}", 3) AS INTEGER)) FROM {table}').fetchone()[0]
+                    conn.execute("INSERT INTO id_sequences VALUES (?, ?)", (prefix, (max_value or 0) + 1))
+
+    @staticmethod
+    def insert_rows(conn, table, schema, df):
+        columns = ", ".join(f'"{col}"' for col in schema)
+        placeholders = ", ".join("?" for _ in schema)
+        rows = df[list(schema)].astype(object).values.tolist()
+        conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+    def _insert_row(self, table, schema, row):
+        columns = ", ".join(f'"{col}"' for col in schema)
+        placeholders = ", ".join("?" for _ in schema)
+        self._conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                           [row.get(col) for col in schema])
+
+    def _update_row(self, table, key_column, key, changes):
+        assignments = ", ".join(f'"{col}" = ?' for col in changes)
+        self._conn.execute(f'UPDATE {table} SET {assignments} WHERE "{key_column}" = ?',
+                           [*changes.values(), key])
+        self._conn.execute("INSERT INTO changes (table_name, key) VALUES (?, ?)", (table, key))
+
+    def _load(self):
+        # 先记下位置再读表，期间其他进程提交的行会在下次同步时再读一遍，已有的行会被跳过
+        for table in ("owners", "claims"):
+            self._last_rowids[table] = self._conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        self._last_change = self._conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0] or 0
+        self.owners = BufferedTable(pd.read_sql_query("SELECT * FROM owners ORDER BY rowid", self._conn),
+                                    "车主编号", OWNER_DTYPES, OWNER_SEARCH_COLUMNS)
+        self.claims = BufferedTable(pd.read_sql_query("SELECT * FROM claims ORDER BY rowid", self._conn),
+                                    "索赔编号", CLAIM_DTYPES, CLAIM_SEARCH_COLUMNS, CLAIM_SORTED_COLUMNS)
+        self.stats = RunningStats.from_frames(self.owners.frame, self.claims.frame)
+        self.version += 1
+
+    def refresh(self):
+        """其他进程有新提交时同步数据，首次调用时全量加载"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is None:
+                self._load()
+            elif data_version != self._data_version:
+                self._sync()
+            self._data_version = data_version
+
+    def _read_new_rows(self, table):
+        """读取 rowid 大于上次位置的行（存储形式）"""
+        rows = pd.read_sql_query(f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid",
+                                 self._conn, params=(self._last_rowids[table],))
+        if len(rows):
+            self._last_rowids[table] = int(rows["_rowid"].iloc[-1])
+        return rows.drop(columns="_rowid")
+
+    def _read_changed_rows(self):
+        """读取修改日志中上次位置之后被修改的行，返回 {表名: 行DataFrame（存储形式）}"""
+        logged = self._conn.execute("SELECT seq, table_name, key FROM changes WHERE seq > ? ORDER BY seq",
+                                    (self._last_change,)).fetchall()
+        if not logged:
+            return {}
+        self._last_change = logged[-1][0]
+        keys = defaultdict(dict)
+        for _, table, key in logged:
+            keys[table][key] = None
+        changed = {}
+        for table, key_column in (("owners", "车主编号"), ("claims", "索赔编号")):
+            table_keys = list(keys.get(table, ()))
+            frames = [pd.read_sql_query(f'SELECT * FROM {table} WHERE "{key_column}" IN '
+                                        f'({", ".join("?" for _ in chunk)})', self._conn, params=chunk)
+                      for chunk in (table_keys[i:i + 500] for i in range(0, len(table_keys), 500))]
+            if frames:
+                changed[table] = pd.concat(frames, ignore_index=True)
+        return changed
+
+    @staticmethod
+    def _row_changes(current, stored, dtypes):
+        """stored（存储形式）与内存中的 current 不同的字段"""
+        values = coerce_values(stored, dtypes)
+        return {col: stored[col] for col in stored
+                if not (pd.isna(values[col]) and pd.isna(current[col])) and values[col] != current[col]}
+
+    def _sync(self):
+        """增量应用其他进程提交的新增和修改
+
+        新增的行按 rowid 读取，主键已在内存中的（本进程写入的）跳过；被修改的行整行读出，
+        与内存比较后只应用不同的字段，重复应用同一修改不会改变结果。
+        """
+        applied = False
+        # 先同步车主，新索赔的品牌统计要用到车主品牌
+        owners = self._read_new_rows("owners")
+        owners = owners[self.owners.positions(owners["车主编号"].tolist()) < 0]
+        if len(owners):
+            self._append_owners(apply_dtypes(owners, OWNER_DTYPES))
+            applied = True
+        claims = self._read_new_rows("claims")
+        claims = claims[self.claims.positions(claims["索赔编号"].tolist()) < 0]
+        if len(claims):
+            self._append_claims(apply_dtypes(claims, CLAIM_DTYPES))
+            applied = True
+
+        changed = self._read_changed_rows()
+        for stored in changed.get("owners", pd.DataFrame()).to_dict("records"):
+            changes = self._row_changes(self.owners.get(stored["车主编号"]), stored, OWNER_DTYPES)
+            if changes:
+                self._apply_owner_update(stored["车主编号"], changes)
+                applied = True
+        for stored in changed.get("claims", pd.DataFrame()).to_dict("records"):
+            changes = self._row_changes(self.claims.get(stored["索赔编号"]), stored, CLAIM_DTYPES)
+            if changes:
+                self._apply_claim_update(stored["索赔编号"], changes)
+                applied = True
+        # 只预留了编号等没有数据变化的提交不使聚合缓存失效
+        if applied:
+            self.version += 1
+
+    def _owner_brand(self, owner_id):
+        owner = self.owners.get(owner_id)
+        return None if owner is None else owner["车辆品牌"]
+
+    def _owner_brands(self, owner_ids):
+        """各车主的车辆品牌，车主不存在时为None"""
+        # 不存在的车主位置为-1，正好取到末尾追加的None
+        brands = np.append(self.owners_data["车辆品牌"].to_numpy(dtype=object), None)
+        return brands[self.owners.positions(owner_ids)]
+
+    @property
+    def owners_data(self):
+        return self.owners.frame
+
+    @property
+    def claims_data(self):
+        return self.claims.frame
+
+    def get_owner(self, owner_id):
+        """按车主编号取单条记录，不存在时返回None"""
+        return self.owners.get(owner_id)
+
+    def get_claim(self, claim_id):
+        """按索赔编号取单条记录，不存在时返回None"""
+        return self.claims.get(claim_id)
+
+    def search_owners(self, column, text):
+        """按子串查询车主"""
+        return self.owners.search(column, text)
+
+    def search_claims(self, column, text):
+        """按子串查询索赔"""
+        return self.claims.search(column, text)
+
+    def query_claims(self):
+        """索赔查询，区间条件和取最新记录走有序索引"""
+        return Query(self.claims_data, self.claims.sorted_index)
+
+    def next_owner_id(self):
+        return self._ids.next_id("OW")
+
+    def next_claim_id(self):
+        return self._ids.next_id("CL")
+
+    def add_owner(self, row):
+        with self._lock, self._conn:
+            self._insert_row("owners", OWNER_SCHEMA, row)
+            self.owners.append(row)
+            self.stats.add_owner(row)
+            self.version += 1
+
+    def add_claim(self, row):
+        with self._lock, self._conn:
+            self._insert_row("claims", CLAIM_SCHEMA, row)
+            self.claims.append(row)
+            self.stats.add_claim(row, self._owner_brand(row["车主编号"]))
+            self.version += 1
+
+    def _insert_frame(self, table, schema, df):
+        """分块转为存储形式后写入，调用方负责事务"""
+        for start in range(0, len(df), IMPORT_CHUNK_ROWS):
+            self.insert_rows(self._conn, table, schema, to_storage(df.iloc[start:start + IMPORT_CHUNK_ROWS]))
+
+    def add_owners(self, owners):
+        """批量新增车主：owners 为已校验的新行（不含车主编号），统一分配编号后在一个事务中写入，返回编号列表"""
+        ids = self._ids.next_ids("OW", len(owners))
+        owners = owners.assign(车主编号=ids)[list(OWNER_SCHEMA)]
+        with self._lock, self._conn:
+            self._insert_frame("owners", OWNER_SCHEMA, owners)
+            self._append_owners(owners)
+            self.version += 1
+        return ids
+
+    def _append_owners(self, owners):
+        self.owners.extend(owners)
+        self.stats.add_owners(owners)
+
+    def add_claims(self, claims):
+        """批量新增索赔：claims 为已校验的新行（不含索赔编号，车主编号均已存在），返回编号列表"""
+        ids = self._ids.next_ids("CL", len(claims))
+        claims = claims.assign(索赔编号=ids)[list(CLAIM_SCHEMA)]
+        with self._lock, self._conn:
+            self._insert_frame("claims", CLAIM_SCHEMA, claims)
+            self._append_claims(claims)
+            self.version += 1
+        return ids
+
+    def _append_claims(self, claims):
+        brands = self._owner_brands(claims["车主编号"].tolist())
+        self.claims.extend(claims)
+        self.stats.add_claims(claims, brands)
+
+    def existing_owners(self, owner_ids):
+        """各车主编号是否存在"""
+        return self.owners.positions(owner_ids) >= 0
+
+    def update_owner(self, owner_id, changes):
+        with self._lock, self._conn:
+            self._update_row("owners", "车主编号", owner_id, changes)
+            self._apply_owner_update(owner_id, changes)
+            self.version += 1
+
+    def _apply_owner_update(self, owner_id, changes):
+        # 表更新成功后再应用统计差量，更新失败回滚时计数器不会与数据不一致
+        old_row = self.owners.get(owner_id).copy()
+        self.owners.update(owner_id, changes)
+        self.stats.update_owner(old_row, changes)
+
+    def update_claim(self, claim_id, changes):
+        with self._lock, self._conn:
+            self._update_row("claims", "索赔编号", claim_id, changes)
+            self._apply_claim_update(claim_id, changes)
+            self.version += 1
+
+    def _apply_claim_update(self, claim_id, changes):
+        old_row = self.claims.get(claim_id).copy()
+        self.claims.update(claim_id, changes)
+        self.stats.update_claim(old_row, changes, self._owner_brand(old_row["车主编号"]))
+
+
+def write_generated_data(db_path, n_owners, n_claims, seed=None, today=None, progress=None):
+    """生成测试数据并直接写入SQLite库，每块一个事务，内存占用只与块大小有关
+
+    目标库须为新库或空库；写完后编号计数器从生成的最大编号继续。
+    progress 为回调函数时，每写入一块以 (表名, 该块行数) 调用一次。
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        ClaimsRepository.create_tables(conn, sample_data=False)
+        if conn.execute("SELECT COUNT(*) FROM owners").fetchone()[0]:
+            raise ValueError(f"{db_path} 中已有数据，请指定新的数据库文件")
+        for table, chunk in iter_generated_data(n_owners, n_claims, seed, today):
+            with conn:
+                ClaimsRepository.insert_rows(conn, table, OWNER_SCHEMA if table == "owners" else CLAIM_SCHEMA, chunk)
+            if progress is not None:
+                progress(table, len(chunk))
+        with conn:
+            conn.executemany("UPDATE id_sequences SET next_value = ? WHERE name = ?",
+                             [(n_owners + 1, "OW"), (n_claims + 1, "CL")])
+    finally:
+        conn.close()
+
+
+@st.cache_resource
+def get_repository():
+    """获取进程内共享的数据仓库"""
+    return ClaimsRepository(DB_PATH)
 
 
 def initialize_data():
     """初始化数据"""
-    if not st.session_state.initialized:
-        owners_df, claims_df = generate_sample_data()
-        st.session_state.owners_data = owners_df
-        st.session_state.claims_data = claims_df
-        st.session_state.initialized = True
+    repo = get_repository()
+    repo.refresh()
+    return repo
+
+
+@st.cache_data(max_entries=8)
+def get_dashboard_metrics(_repo, version):
+    """系统概览指标，数据版本变化后才重新计算"""
+    stats = _repo.stats
+    return {
+        "total_owners": stats.total_owners,
+        "total_claims": stats.total_claims,
+        "total_claim_amount": stats.total_claim_amount,
+        "approved_claims": stats.status_counts["已批准"],
+        "claim_type_counts": counter_series(stats.type_counts),
+        "status_counts": counter_series(stats.status_counts),
+        "brand_counts": counter_series(stats.brand_counts).head(8),
+        "recent_claims": _repo.query_claims().largest("创建时间", 10)[
+            ["索赔编号", "车主编号", "索赔类型", "索赔金额", "处理状态", "申请日期"]
+        ]
+    }
 
 
-def export_to_excel(dataframes, sheet_names):
-    """导出数据到Excel"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+@st.cache_resource(max_entries=2)
+def get_claims_analysis(_repo, version):
+    """统计分析用的派生列
+
+    单独成表并按数据版本缓存，不写回索赔主表，主表保持原有列，导出也不会带上分析列。
+    """
+    claims_data = _repo.claims_data
+
+    # 创建金额区间
+    bins = [0, 5000, 10000, 20000, 50000, float('inf')]
+    labels = ['0-5K', '5K-10K', '10K-20K', '20K-50K', '50K+']
+    return pd.DataFrame({
+        "索赔类型": claims_data["索赔类型"],
+        "处理状态": claims_data["处理状态"],
+        "索赔金额": claims_data["索赔金额"],
+        "金额区间": pd.cut(claims_data['索赔金额'], bins=bins, labels=labels),
+        # 按月、按季度统计
+        "申请月份": claims_data['申请日期'].dt.to_period('M'),
+        "申请季度": claims_data['申请日期'].dt.to_period('Q'),
+        # 计算处理天数
+        "处理天数": (claims_data['更新时间'] - claims_data['申请日期']).dt.days
+    })
+
+
+@st.cache_data(max_entries=8)
+def get_statistics_metrics(_repo, version):
+    """数据统计页的各项聚合，数据版本变化后才重新计算"""
+    analysis = get_claims_analysis(_repo, version)
+    stats = _repo.stats
+    brand_claims = counter_series(stats.brand_claim_counts)
+    approval_stats = pd.DataFrame({
+        '总数': counter_series(stats.type_counts),
+        '批准数': pd.Series(stats.type_approved, dtype="int64")
+    }).fillna({'批准数': 0}).sort_index()
+    approval_stats['批准率'] = (approval_stats['批准数'] / approval_stats['总数'] * 100).round(1)
+
+    processing_time = analysis[analysis['处理状态'].isin(['已批准', '已拒绝', '已结案'])]
+
+    return {
+        "total_owners": stats.total_owners,
+        "total_claims": stats.total_claims,
+        "avg_claim_amount": stats.total_claim_amount / stats.total_claims if stats.total_claims else 0,
+        "max_claim_amount": stats.max_claim_amount,
+        "amount_dist": analysis['金额区间'].value_counts(),
+        "monthly_claims": analysis['申请月份'].value_counts().sort_index(),
+        "brand_claims": brand_claims,
+        "brand_avg_amount": (pd.Series(stats.brand_claim_amounts)[brand_claims.index] / brand_claims).sort_values(
+            ascending=True),
+        "type_amount": counter_series(stats.type_amounts),
+        "approval_stats": approval_stats,
+        "avg_processing_by_type": processing_time.groupby('索赔类型', observed=True)['处理天数'].mean().sort_values(),
+        "quarterly_claims": analysis['申请季度'].value_counts().sort_index(),
+        "quarterly_amount": analysis.groupby('申请季度')['索赔金额'].sum()
+    }
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def bar_figure(series, title, color_scale, horizontal=False, **layout):
+    """柱状图，颜色随数值深浅变化
+
+    图表按聚合数据和图表参数缓存，数据不变时直接复用已构建的图表对象。
+    返回的图表为各会话共用，调用方不要修改。
+    """
+    if horizontal:
+        fig = px.bar(x=series.values, y=series.index, orientation='h', title=title,
+                     color=series.values, color_continuous_scale=color_scale)
+    else:
+        fig = px.bar(x=series.index, y=series.values, title=title,
+                     color=series.values, color_continuous_scale=color_scale)
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def pie_figure(series, title, labels_inside=False, **layout):
+    """饼图，缓存方式同 bar_figure"""
+    fig = px.pie(values=series.values, names=series.index, title=title)
+    if labels_inside:
+        fig.update_traces(textposition='inside', textinfo='percent+label')
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def line_figure(series, title, **layout):
+    """带数据点的折线图，索引（如月份）转为文本作横轴，缓存方式同 bar_figure"""
+    fig = px.line(x=[str(i) for i in series.index], y=series.values, title=title, markers=True)
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def quarterly_figure(quarterly_claims, quarterly_amount):
+    """季度索赔数量与金额的双轴折线图，缓存方式同 bar_figure"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=[str(q) for q in quarterly_claims.index],
+        y=quarterly_claims.values,
+        mode='lines+markers',
+        name='索赔数量',
+        yaxis='y'
+    ))
+    fig.add_trace(go.Scatter(
+        x=[str(q) for q in quarterly_amount.index],
+        y=quarterly_amount.values,
+        mode='lines+markers',
+        name='索赔金额',
+        yaxis='y2',
+        line=dict(color='red')
+    ))
+
+    fig.update_layout(
+        title="季度索赔数量与金额趋势",
+        xaxis_title="季度",
+        yaxis=dict(title="索赔数量", side="left"),
+        yaxis2=dict(title="索赔金额", side="right", overlaying="y"),
+        legend=dict(x=0.01, y=0.99)
+    )
+    return fig
+
+
+class PerfRecorder:
+    """页面和图表的耗时记录
+
+    每项保留最近 window 个样本用于计算分位数，另外累计总次数和总耗时，可导出为 Prometheus 文本格式。
+    """
+
+    def __init__(self, window=PERF_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = Counter()
+        self._sums = Counter()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._sums[name] += seconds
+        PERF_LOGGER.debug(json.dumps({"event": "timing", "name": name, "ms": round(seconds * 1000, 3)},
+                                     ensure_ascii=False))
+
+    def _snapshot(self):
+        with self._lock:
+            return [(name, np.array(samples), self._counts[name], self._sums[name])
+                    for name, samples in self._samples.items()]
+
+    def summary(self):
+        """各项的次数和最近样本的 p50/p95/最大值（毫秒），按 p95 降序"""
+        rows = [{"名称": name, "次数": count,
+                 "p50(ms)": np.percentile(samples, 50) * 1000,
+                 "p95(ms)": np.percentile(samples, 95) * 1000,
+                 "最大(ms)": samples.max() * 1000,
+                 "最近(ms)": samples[-1] * 1000}
+                for name, samples, count, _ in self._snapshot()]
+        summary = pd.DataFrame(rows, columns=["名称", "次数", "p50(ms)", "p95(ms)", "最大(ms)", "最近(ms)"])
+        return summary.sort_values("p95(ms)", ascending=False, ignore_index=True).round(1)
+
+    def prometheus(self):
+        """Prometheus 文本格式的 summary 指标"""
+        lines = ["# HELP claims_render_seconds 页面和图表的渲染耗时",
+                 "# TYPE claims_render_seconds summary"]
+        for name, samples, count, total in self._snapshot():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for quantile in (0.5, 0.95):
+                lines.append(f'claims_render_seconds{{name="{label}",quantile="{quantile}"}} '
+                             f'{np.quantile(samples, quantile):.6f}')
+            lines.append(f'claims_render_seconds_sum{{name="{label}"}} {total:.6f}')
+            lines.append(f'claims_render_seconds_count{{name="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._sums.clear()
+
+
+@st.cache_resource
+def get_perf_recorder():
+    """耗时记录，所有会话共享"""
+    return PerfRecorder()
+
+
+@contextlib.contextmanager
+def timed(name):
+    """记录代码块的耗时，也可作为函数装饰器使用"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_perf_recorder().record(name, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def profiled(profiler):
+    """用 cProfile 或 pyinstrument 剖析代码块，文本报告存入 session_state["perf_profile_report"]"""
+    if profiler == "pyinstrument":
+        session = pyinstrument.Profiler()
+        session.start()
+        try:
+            yield
+        finally:
+            session.stop()
+            st.session_state["perf_profile_report"] = session.output_text(unicode=True, color=False)
+    else:
+        session = cProfile.Profile()
+        session.enable()
+        try:
+            yield
+        finally:
+            session.disable()
+            stream = io.StringIO()
+            pstats.Stats(session, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            st.session_state["perf_profile_report"] = stream.getvalue()
+
+
+@st.fragment
+def show_perf_panel():
+    """侧边栏的性能监控面板，地址栏带 ?admin=1 时显示；面板内的操作只重跑面板本身"""
+    if st.query_params.get("admin") != "1":
+        return
+    recorder = get_perf_recorder()
+    with st.expander("🛠️ 性能监控"):
+        st.dataframe(recorder.summary(), hide_index=True, use_container_width=True)
+        profilers = ["cProfile"] + (["pyinstrument"] if pyinstrument is not None else [])
+        profiler = st.selectbox("剖析工具", profilers, key="perf_profiler")
+        if st.button("🔬 剖析下一次重跑", key="perf_profile_button"):
+            st.session_state["perf_profile_next"] = profiler
+            st.rerun()
+        report = st.session_state.get("perf_profile_report")
+        if report:
+            st.code(report, language=None)
+        st.download_button(
+            label="📥 Prometheus 指标",
+            data=recorder.prometheus,
+            file_name="claims_metrics.prom",
+            mime="text/plain",
+            key="perf_prometheus",
+            on_click="ignore"
+        )
+        if st.button("🗑️ 清空记录", key="perf_clear"):
+            recorder.clear()
+
+
+class Query:
+    """组合筛选条件
+
+    各条件先登记，取结果时一次求值，筛选过程不产生中间DataFrame；计数和汇总基于同一组结果行计算。
+    提供 index_for 时，有有序索引的区间条件先用二分查找取出候选行，其余条件只在候选行上求值。
+    安装了 numexpr 时数值区间条件用它求值。
+    """
+
+    def __init__(self, data, index_for=None):
+        self.data = data
+        self._index_for = index_for
+        # (列名, 对该列求布尔数组的函数, 可走有序索引的区间或None)
+        self._predicates = []
+        self._positions = None
+
+    def equals(self, column, value):
+        """column == value，分类列直接比较类别编码"""
+        return self.isin(column, [value])
+
+    def isin(self, column, values):
+        """column 取值在 values 中，分类列直接比较类别编码"""
+        def predicate(series):
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = [series.cat.categories.get_loc(value) for value in values
+                         if value in series.cat.categories]
+                return np.isin(series.cat.codes.to_numpy(), codes)
+            return np.isin(series.to_numpy(), values)
+        self._predicates.append((column, predicate, None))
+        return self
+
+    def range(self, column, low=None, high=None):
+        """low < column <= high，None表示不限"""
+        def predicate(series):
+            values = series.to_numpy()
+            if numexpr is not None and low is not None and high is not None:
+                return numexpr.evaluate("(values > low) & (values <= high)",
+                                        local_dict={"values": values, "low": low, "high": high})
+            mask = np.ones(len(values), dtype=bool)
+            if low is not None:
+                mask &= values > low
+            if high is not None:
+                mask &= values <= high
+            return mask
+        self._predicates.append((column, predicate, (low, high, False, True)))
+        return self
+
+    def between(self, column, start, end):
+        """start <= column <= end"""
+        start, end = pd.Timestamp(start).to_datetime64(), pd.Timestamp(end).to_datetime64()
+
+        def predicate(series):
+            values = series.to_numpy()
+            return (values >= start) & (values <= end)
+        self._predicates.append((column, predicate, (start, end, True, True)))
+        return self
+
+    def _index(self, column):
+        return None if self._index_for is None else self._index_for(column)
+
+    def _filter(self, positions, predicates):
+        """在候选行上依次求值条件"""
+        for column, predicate, _ in predicates:
+            positions = positions[predicate(self.data[column].iloc[positions])]
+        return positions
+
+    @property
+    def positions(self):
+        """满足全部条件的行位置（升序），没有条件时为None"""
+        if self._positions is None and self._predicates:
+            indexed = [i for i, (column, _, bounds) in enumerate(self._predicates)
+                       if bounds is not None and self._index(column) is not None]
+            if indexed:
+                column, _, bounds = self._predicates[indexed[0]]
+                positions = self._index(column).range(*bounds)
+                # 索引中可能已有尚未进入本次数据快照的新行
+                positions = positions[positions < len(self.data)]
+                rest = self._predicates[:indexed[0]] + self._predicates[indexed[0] + 1:]
+                self._positions = self._filter(positions, rest)
+            else:
+                column, predicate, _ = self._predicates[0]
+                mask = predicate(self.data[column])
+                for column, predicate, _ in self._predicates[1:]:
+                    np.logical_and(mask, predicate(self.data[column]), out=mask)
+                self._positions = np.flatnonzero(mask)
+        return self._positions
+
+    def count(self):
+        return len(self.data) if self.positions is None else len(self.positions)
+
+    def values(self, column):
+        values = self.data[column].to_numpy()
+        return values if self.positions is None else values[self.positions]
+
+    def result(self):
+        """筛选结果"""
+        return self.data if self.positions is None else self.data.iloc[self.positions]
+
+    def snapshot(self):
+        """筛选结果的独立副本；有筛选条件时按行位置取出本身就是副本，不再复制第二遍"""
+        return self.data.copy() if self.positions is None else self.data.iloc[self.positions]
+
+    def head(self, n):
+        """前 n 条结果，不生成完整结果表"""
+        if self.positions is None:
+            return self.data.head(n)
+        return self.data.iloc[self.positions[:n]]
+
+    def largest(self, column, n):
+        """column 最大的 n 条结果；有有序索引时从大到小读索引，只检查读到的行"""
+        index = self._index(column)
+        if index is None:
+            return self.result().nlargest(n, column)
+        ordered = index.descending()
+        ordered = ordered[ordered < len(self.data)]
+        found = []
+        chunk = max(n * 4, 256)
+        for start in range(0, len(ordered), chunk):
+            found.extend(self._filter(ordered[start:start + chunk], self._predicates)[:n - len(found)])
+            if len(found) >= n:
+                break
+        return self.data.iloc[found]
+
+    def page(self, column, ascending, start, n):
+        """按 column 排序后的第 start 条起的 n 条结果
+
+        有有序索引时按索引顺序分块读出行位置，用筛选结果的行掩码过滤，凑够本页即停止，翻页不再排序；
+        没有索引的列对筛选结果的排序列排序。
+        """
+        index = self._index(column)
+        if index is None:
+            keys = self.data[column] if self.positions is None else self.data[column].iloc[self.positions]
+            order = keys.sort_values(ascending=ascending, kind="stable").index
+            return self.data.loc[order[start:start + n]]
+        ordered = index.descending()
+        if ascending:
+            ordered = ordered[::-1]
+        mask = None
+        if self.positions is not None:
+            mask = np.zeros(len(self.data), dtype=bool)
+            mask[self.positions] = True
+        found, count = [], 0
+        chunk = max((start + n) * 4, 4096)
+        for offset in itertools.count(0, chunk):
+            if offset >= len(ordered) or count >= start + n:
+                break
+            rows = ordered[offset:offset + chunk]
+            rows = rows[rows < len(self.data)]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            found.append(rows)
+            count += len(rows)
+        rows = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        return self.data.iloc[rows[start:start + n]]
+
+
+def lazy_tabs(labels, key):
+    """按需渲染的选项卡
+
+    st.tabs 每次重跑都会执行所有选项卡的内容，这里用横向单选代替，调用方只渲染返回的那一项。
+    选中项保存在 session_state[key] 中，重跑后保持不变。
+    """
+    return st.radio("选项卡", labels, key=key, horizontal=True, label_visibility="collapsed")
+
+
+def flash(message):
+    """数据修改后整页重跑，片段外的侧边栏统计和图表随之刷新；提示信息留到重跑后显示"""
+    st.session_state["flash_message"] = message
+    st.rerun()
+
+
+def show_flash():
+    """显示上一次数据修改留下的提示信息"""
+    message = st.session_state.pop("flash_message", None)
+    if message:
+        st.success(message)
+        st.balloons()
+
+
+def paginate(query, sort_by, ascending, page, page_size):
+    """分页查询：排序列有有序索引时按索引顺序取页，否则只对排序列排序；返回当前页数据和总记录数"""
+    return query.page(sort_by, ascending, (page - 1) * page_size, page_size), query.count()
+
+
+def show_paged_dataframe(query, sort_by, ascending, key):
+    """分页显示表格，只把当前页发送到浏览器"""
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("每页条数", PAGE_SIZES, key=f"{key}_page_size")
+    total = query.count()
+    total_pages = max(1, -(-total // page_size))
+    # 筛选条件变化后总页数可能变少
+    if st.session_state.get(f"{key}_page", 1) > total_pages:
+        st.session_state[f"{key}_page"] = total_pages
+    with col2:
+        page = st.number_input("页码", min_value=1, max_value=total_pages, value=1, step=1, key=f"{key}_page")
+    page_data, total = paginate(query, sort_by, ascending, page, page_size)
+    with col3:
+        st.write("")
+        st.caption(f"第 {page} / {total_pages} 页，共 {total} 条")
+    st.dataframe(page_data, use_container_width=True)
+
+
+def iter_row_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """按行块取出可直接写入文件的Python值，缺失值转为None
+
+    progress 为回调函数时，每块写完后以该块行数调用一次。
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        yield chunk.where(chunk.notna(), None).values.tolist()
+        if progress is not None:
+            progress(len(chunk))
+
+
+def iter_csv_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """按行块生成CSV文本，第一块带表头"""
+    yield df.head(0).to_csv(index=False)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=False)
+        if progress is not None:
+            progress(len(chunk))
+
+
+def export_to_csv(df, progress=None):
+    """分块写出CSV（UTF-8 BOM，Excel可直接打开），返回已回到开头的文件对象"""
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    output.write(codecs.BOM_UTF8)
+    for text in iter_csv_chunks(df, progress=progress):
+        output.write(text.encode("utf-8"))
+    output.seek(0)
+    return output
+
+
+def csv_bytes(df):
+    """小表直接取CSV内容（bytes），供下载按钮使用"""
+    with export_to_csv(df) as output:
+        return output.read()
+
+
+def date_only_columns(df):
+    """只有日期部分的列（存储格式为 %Y-%m-%d）的列序号"""
+    return [i for i, col in enumerate(df.columns) if STORAGE_DATE_FORMATS.get(col) == "%Y-%m-%d"]
+
+
+def export_to_excel(dataframes, sheet_names, progress=None):
+    """分块写出Excel，返回已回到开头的文件对象
+
+    优先用 xlsxwriter 的 constant_memory 模式逐行写出，未安装时退回 openpyxl 的 write_only 模式，
+    两种方式都不会在内存中保留整个工作簿。时间列显示到秒，只有日期的列只显示日期。
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(output, {"constant_memory": True,
+                                                "strings_to_urls": False,
+                                                "strings_to_formulas": False,
+                                                "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
         for df, sheet_name in zip(dataframes, sheet_names):
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-    return output.getvalue()
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, list(df.columns))
+            date_columns = date_only_columns(df)
+            row_num = 1
+            for rows in iter_row_chunks(df, progress=progress):
+                for row in rows:
+                    worksheet.write_row(row_num, 0, row)
+                    # write_row 对日期统一使用 default_date_format，日期列按单元格格式重写
+                    for i in date_columns:
+                        if row[i] is not None:
+                            worksheet.write_datetime(row_num, i, row[i], date_format)
+                    row_num += 1
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        workbook = Workbook(write_only=True)
+        for df, sheet_name in zip(dataframes, sheet_names):
+            worksheet = workbook.create_sheet(sheet_name)
+            worksheet.append(list(df.columns))
+            date_columns = date_only_columns(df)
+            for rows in iter_row_chunks(df, progress=progress):
+                for row in rows:
+                    for i in date_columns:
+                        if row[i] is not None:
+                            row[i] = WriteOnlyCell(worksheet, value=row[i])
+                            row[i].number_format = "yyyy-mm-dd"
+                    worksheet.append(row)
+        workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def iter_record_batches(df, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """按列类型转为Arrow表后分批取出，分类列为字典编码，各批共用同一份字典"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        yield table.schema, batch
+        if progress is not None:
+            progress(batch.num_rows)
+
+
+def export_to_parquet(df, compression="zstd", progress=None):
+    """分批写出Parquet，每批一个行组，返回已回到开头的文件对象"""
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    writer = None
+    for schema, batch in iter_record_batches(df, progress=progress):
+        if writer is None:
+            writer = pq.ParquetWriter(output, schema, compression=compression)
+        writer.write_batch(batch)
+    if writer is None:
+        writer = pq.ParquetWriter(output, pa.Schema.from_pandas(df, preserve_index=False),
+                                  compression=compression)
+    writer.close()
+    output.seek(0)
+    return output
+
+
+def export_to_arrow(df, compression="zstd", progress=None):
+    """分批写出Arrow IPC文件（即Feather V2），返回已回到开头的文件对象"""
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    writer = None
+    for schema, batch in iter_record_batches(df, progress=progress):
+        if writer is None:
+            writer = pa.ipc.new_file(output, schema, options=options)
+        writer.write_batch(batch)
+    if writer is None:
+        writer = pa.ipc.new_file(output, pa.Schema.from_pandas(df, preserve_index=False), options=options)
+    writer.close()
+    output.seek(0)
+    return output
+
+
+class ExportJob:
+    """一个导出任务，进度按已写出的行数计算
+
+    build() 返回 (dataframes, sheet_names)，在后台线程中开始导出时才调用，取数据快照不占用页面的脚本线程。
+    """
+
+    def __init__(self, key, build, file_format, title, compression=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.key = key
+        self.sheet_names = []
+        self.file_format = file_format
+        self.title = title
+        self.compression = compression
+        self.status = "排队中"
+        self.total_rows = 0
+        self.rows_written = 0
+        self.error = None
+        self.created_at = datetime.now()
+        # [(按钮文字, 文件名, mime, 文件对象)]
+        self.artifacts = []
+        self._build = build
+        self._dataframes = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in ("已完成", "失败")
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 1.0 if self.done else 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    def _advance(self, rows):
+        self.rows_written += rows
+
+    def run(self):
+        self.status = "准备数据"
+        stamp = self.created_at.strftime('%Y%m%d_%H%M%S')
+        extension, mime = EXPORT_FORMATS[self.file_format]
+        try:
+            self._dataframes, self.sheet_names = self._build()
+            self.total_rows = sum(len(df) for df in self._dataframes)
+            self.status = "进行中"
+            if self.file_format == "Excel (.xlsx)":
+                output = export_to_excel(self._dataframes, self.sheet_names, progress=self._advance)
+                self.artifacts.append(("Excel 文件", f"{self.title}_{stamp}.{extension}", mime, output))
+            else:
+                # CSV 和列式格式每个数据集一个文件
+                for df, name in zip(self._dataframes, self.sheet_names):
+                    if self.file_format == "Parquet (.parquet)":
+                        output = export_to_parquet(df, self.compression, progress=self._advance)
+                    elif self.file_format == "Arrow IPC (.arrow)":
+                        output = export_to_arrow(df, self.compression, progress=self._advance)
+                    else:
+                        output = export_to_csv(df, progress=self._advance)
+                    label = f"{name} {self.file_format.split(' (')[0]}"
+                    self.artifacts.append((label, f"{name}_{stamp}.{extension}", mime, output))
+            self.status = "已完成"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "失败"
+        finally:
+            # 文件写完后不再需要数据快照
+            self._build = self._dataframes = None
+
+    def read(self, output):
+        """读出文件内容，同一个文件可能被多个会话同时下载"""
+        with self._lock:
+            output.seek(0)
+            return output.read()
+
+    def close(self):
+        with self._lock:
+            for *_, output in self.artifacts:
+                output.close()
+
+
+class ExportQueue:
+    """后台导出队列
+
+    取数据快照和写出文件都在线程池中执行，页面只登记任务并轮询进度，不会阻塞脚本线程，
+    登记时也不会等待其他会话的快照。
+    任务按请求参数（含数据版本）登记，相同请求直接复用已有任务和它生成的文件；
+    已结束的任务超过上限时按最近最少使用的顺序淘汰。
+    """
+
+    def __init__(self, workers=EXPORT_WORKERS, limit=EXPORT_JOB_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+        self.limit = limit
+        # 任务编号 -> 任务，按最近使用的先后排列
+        self._jobs = {}
+        self._by_key = {}
+
+    def submit(self, key, build, file_format, title, compression=None):
+        """登记导出任务并返回
+
+        build() 返回 (dataframes, sheet_names)，只在没有可复用的任务时由后台线程调用，
+        返回的表须是快照，后台写出期间不能再被修改。
+        """
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is not None and job.status != "失败":
+                # 复用时移到末尾，最后才被淘汰
+                self._jobs[job.id] = self._jobs.pop(job.id)
+                return job
+            job = ExportJob(key, build, file_format, title, compression)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._evict()
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _evict(self):
+        """已结束的任务超过上限时，丢弃最久未使用的任务及其文件"""
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(len(finished) - self.limit, 0)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            job.close()
+
+
+@st.cache_resource
+def get_export_queue():
+    """导出队列，所有会话共享"""
+    return ExportQueue()
+
+
+def submit_export(key, build, file_format, title="汽车索赔数据", compression=None):
+    """提交导出任务，并记入当前会话的任务列表"""
+    job = get_export_queue().submit(key, build, file_format, title, compression)
+    job_ids = st.session_state.setdefault("export_jobs", [])
+    if job.id in job_ids:
+        job_ids.remove(job.id)
+    job_ids.insert(0, job.id)
+    return job
+
+
+def show_export_jobs():
+    """显示当前会话的导出任务；有任务未结束时定时刷新这一部分"""
+    queue = get_export_queue()
+    job_ids = st.session_state.get("export_jobs", [])
+    if not any(queue.get(job_id) for job_id in job_ids):
+        return
+    running = any(not job.done for job in map(queue.get, job_ids) if job is not None)
+
+    @st.fragment(run_every=EXPORT_POLL_SECONDS if running else None)
+    def job_panel():
+        jobs = [job for job in map(queue.get, job_ids) if job is not None]
+        if running and all(job.done for job in jobs):
+            # 全部结束后整页重跑一次，停止定时刷新
+            st.rerun()
+        st.markdown("---")
+        st.subheader("📦 导出任务")
+        for job in jobs:
+            with st.container(border=True):
+                # 快照取出之前还没有表名
+                names = "、".join(job.sheet_names) or job.title
+                file_format = job.file_format if job.compression is None else f"{job.file_format} {job.compression}"
+                st.caption(f"{job.created_at.strftime('%H:%M:%S')} · {names} · {file_format} · {job.status}")
+                if job.status == "失败":
+                    st.error(f"❌ 导出失败: {job.error}")
+                elif not job.done:
+                    st.progress(job.progress, text=f"已写出 {job.rows_written} / {job.total_rows} 行")
+                else:
+                    for label, filename, mime, output in job.artifacts:
+                        # 点击时才读出文件内容，重跑页面不会把文件重新送进内存
+                        st.download_button(
+                            label=f"📥 下载 {label}",
+                            data=partial(job.read, output),
+                            file_name=filename,
+                            mime=mime,
+                            key=f"export_{job.id}_{filename}",
+                            on_click="ignore"
+                        )
+
+    job_panel()
+
+
+def iter_excel_chunks(file, sheet_name, chunk_rows):
+    """以只读模式逐行读取Excel；有名为 sheet_name 的工作表时读取该表，否则读取第一个工作表"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = ["" if value is None else str(value).strip() for value in next(rows, ())]
+        chunk = []
+        for row in rows:
+            if any(value is not None for value in row):
+                chunk.append(row[:len(header)])
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_import_chunks(file, file_name, sheet_name=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """按行块读取导入文件（CSV/Excel/Parquet）
+
+    每块的各列都转为去掉首尾空白的字符串，缺失值为空字符串，日期时间值为 ISO 格式。
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        chunks = pd.read_csv(file, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=chunk_rows)
+    elif extension == ".xlsx":
+        chunks = iter_excel_chunks(file, sheet_name, chunk_rows)
+    elif extension == ".parquet":
+        if pa is None:
+            raise ValueError("读取Parquet文件需要安装 pyarrow")
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows))
+    else:
+        raise ValueError(f"不支持的文件类型：{extension or file_name}")
+    for chunk in chunks:
+        chunk = chunk.astype(object)
+        yield chunk.where(chunk.notna(), "").astype(str).apply(lambda column: column.str.strip())
+
+
+def parse_dates(text):
+    """解析日期列，空字符串和无法解析的值为NaT"""
+    return pd.to_datetime(text.where(text != ""), format="ISO8601", errors="coerce")
+
+
+def parse_amounts(text):
+    """解析金额列，空字符串、负数和非整数为NaN"""
+    amounts = pd.to_numeric(text.where(text != ""), errors="coerce")
+    return amounts.where((amounts >= 0) & (amounts % 1 == 0))
+
+
+def collect_errors(chunk, checks, first_row):
+    """按校验结果汇总错误明细，返回 (每行是否合格, 错误明细)
+
+    checks 为 (列名, 不合格行的布尔Series, 问题说明) 列表，行号从数据第一行起算为1。
+    """
+    valid = np.ones(len(chunk), dtype=bool)
+    errors = []
+    for column, bad, message in checks:
+        bad = bad.to_numpy(dtype=bool)
+        if bad.any():
+            valid &= ~bad
+            rows = np.flatnonzero(bad)
+            errors.append(pd.DataFrame({"行号": rows + first_row, "字段": column, "问题": message,
+                                        "原值": chunk[column].to_numpy()[rows]}))
+    return valid, errors
+
+
+def check_owner_chunk(repo, chunk, first_row):
+    """校验一块车主数据，返回 (合格的新行, 错误明细列表)"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    dates = {col: parse_dates(chunk[col]) for col in ["购买日期", "保险到期日"]}
+    checks = [
+        ("姓名", chunk["姓名"] == "", "必填"),
+        ("身份证号", ~chunk["身份证号"].str.fullmatch(ID_CARD_PATTERN), "应为18位身份证号"),
+        ("电话号码", ~chunk["电话号码"].str.fullmatch(PHONE_PATTERN), "应为11位手机号"),
+        ("车牌号", (chunk["车牌号"] != "") & ~chunk["车牌号"].str.fullmatch(PLATE_PATTERN), "车牌号格式不正确，例：京A12345"),
+        ("车辆品牌", ~chunk["车辆品牌"].isin(CAR_BRANDS), f"应为 {'/'.join(CAR_BRANDS)} 之一")
+    ]
+    checks += [(col, parsed.isna(), "日期格式应为 YYYY-MM-DD") for col, parsed in dates.items()]
+    valid, errors = collect_errors(chunk, checks, first_row)
+
+    owners = chunk[[col for col in OWNER_SCHEMA if col != "车主编号"]].assign(**dates)
+    owners["注册时间"] = parse_dates(owners["注册时间"].where(owners["注册时间"] != "", now))
+    return owners[valid], errors
+
+
+def check_claim_chunk(repo, chunk, first_row):
+    """校验一块索赔数据，返回 (合格的新行, 错误明细列表)；车主编号须已存在"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    today = datetime.now().strftime("%Y-%m-%d")
+    for col, default in (("申请日期", today), ("批准金额", "0"), ("处理状态", "待审核"),
+                         ("创建时间", now), ("更新时间", now)):
+        chunk[col] = chunk[col].where(chunk[col] != "", default)
+    dates = {col: parse_dates(chunk[col]) for col in ["事故日期", "申请日期", "创建时间", "更新时间"]}
+    amounts = {col: parse_amounts(chunk[col]) for col in ["索赔金额", "批准金额"]}
+    checks = [
+        ("车主编号", ~pd.Series(repo.existing_owners(chunk["车主编号"].tolist()), index=chunk.index), "车主编号不存在"),
+        ("索赔类型", ~chunk["索赔类型"].isin(CLAIM_TYPES), f"应为 {'/'.join(CLAIM_TYPES)} 之一"),
+        ("处理状态", ~chunk["处理状态"].isin(CLAIM_STATUSES), f"应为 {'/'.join(CLAIM_STATUSES)} 之一"),
+        ("处理人员", (chunk["处理人员"] != "") & ~chunk["处理人员"].isin(HANDLERS), f"应为 {'/'.join(HANDLERS)} 之一"),
+        ("事故描述", chunk["事故描述"] == "", "必填")
+    ]
+    checks += [(col, parsed.isna(), "日期格式应为 YYYY-MM-DD") for col, parsed in dates.items()]
+    checks += [(col, parsed.isna(), "应为非负整数") for col, parsed in amounts.items()]
+    checks.append(("批准金额", amounts["批准金额"] > amounts["索赔金额"], "不能超过索赔金额"))
+    valid, errors = collect_errors(chunk, checks, first_row)
+
+    claims = chunk[[col for col in CLAIM_SCHEMA if col != "索赔编号"]].assign(**dates)
+    claims = claims[valid]
+    for col in amounts:
+        claims[col] = amounts[col][valid].astype("int64")
+    claims["处理人员"] = claims["处理人员"].where(claims["处理人员"] != "")
+    return claims, errors
+
+
+# 导入目标 -> (表结构, 必须提供的列, 校验函数, Excel工作表名)
+IMPORT_TARGETS = {
+    "owners": (OWNER_SCHEMA, ["姓名", "身份证号", "电话号码", "车辆品牌", "购买日期", "保险到期日"], check_owner_chunk,
+               "车主信息"),
+    "claims": (CLAIM_SCHEMA, ["车主编号", "索赔类型", "事故日期", "索赔金额", "事故描述"], check_claim_chunk, "索赔记录")
+}
+
+
+def import_file(repo, target, file, file_name, progress=None):
+    """从文件批量导入车主（target="owners"）或索赔（target="claims"）
+
+    分块读取和校验，合格行转换列类型后暂存，全部读完后统一分配编号并在一个事务中写入；
+    不合格的行不导入，记入错误明细。编号列即使提供也会重新分配。
+    progress 为回调函数时，每校验完一块以该块行数调用一次。返回 (导入条数, 错误明细DataFrame)。
+    """
+    schema, required, check_chunk, sheet_name = IMPORT_TARGETS[target]
+    dtypes = OWNER_DTYPES if target == "owners" else CLAIM_DTYPES
+    accepted = []
+    errors = []
+    first_row = 1
+    for chunk in read_import_chunks(file, file_name, sheet_name):
+        missing = [col for col in required if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"缺少必填列：{'、'.join(missing)}")
+        for col in schema:
+            if col not in chunk.columns:
+                chunk[col] = ""
+        rows, chunk_errors = check_chunk(repo, chunk, first_row)
+        # 暂存转换后的列类型，分类列和日期列比字符串省内存
+        accepted.append(apply_dtypes(rows, dtypes))
+        errors.extend(chunk_errors)
+        first_row += len(chunk)
+        if progress is not None:
+            progress(len(chunk))
+
+    rows = pd.concat(accepted, ignore_index=True) if accepted else pd.DataFrame()
+    if len(rows):
+        if target == "owners":
+            repo.add_owners(rows)
+        else:
+            repo.add_claims(rows)
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["行号", "字段", "问题", "原值"])
+    return len(rows), errors.sort_values("行号", kind="stable", ignore_index=True)
+
+
+def show_bulk_import(target):
+    """批量导入选项卡"""
+    repo = get_repository()
+    schema, required, _, sheet_name = IMPORT_TARGETS[target]
+    name = "车主" if target == "owners" else "索赔"
+    st.subheader(f"📥 批量导入{name}")
+    st.caption(f"支持 CSV（UTF-8）、Excel（读取“{sheet_name}”工作表或第一个工作表）和 Parquet 文件，"
+               f"首行为列名。必填列：{'、'.join(required)}；"
+               f"可选列：{'、'.join(col for col in schema if col not in required and col != list(schema)[0])}。"
+               f"编号由系统统一分配。")
+
+    uploaded = st.file_uploader("选择文件", type=["csv", "xlsx", "parquet"], key=f"import_{target}_file")
+    if uploaded is not None and st.button("📥 开始导入", type="primary", key=f"import_{target}_button"):
+        status = st.empty()
+        read_rows = [0]
+
+        def advance(rows):
+            read_rows[0] += rows
+            status.info(f"⏳ 已校验 {read_rows[0]} 行...")
+
+        try:
+            imported, errors = import_file(repo, target, uploaded, uploaded.name, progress=advance)
+        except ValueError as e:
+            status.empty()
+            st.error(f"❌ 导入失败：{e}")
+            return
+        status.empty()
+        st.session_state[f"import_{target}_result"] = (uploaded.name, imported, errors)
+        # 数据已变化，整页重跑刷新侧边栏统计
+        st.rerun()
+
+    result = st.session_state.get(f"import_{target}_result")
+    if result is not None:
+        file_name, imported, errors = result
+        st.success(f"✅ {file_name}：导入 {imported} 条{name}记录")
+        if len(errors):
+            st.warning(f"⚠️ {errors['行号'].nunique()} 行未通过校验，未导入")
+            st.dataframe(errors.head(100), use_container_width=True)
+            st.download_button(
+                label="📥 下载错误明细CSV",
+                data=partial(csv_bytes, errors),
+                file_name=f"导入错误明细_{os.path.splitext(file_name)[0]}.csv",
+                mime="text/csv",
+                key=f"import_{target}_errors",
+                on_click="ignore"
+            )
 
 
 def main():
     # 初始化数据
-    initialize_data()
+    repo = initialize_data()
 
     # 侧边栏导航
     st.sidebar.title("🚗 汽车索赔管理系统")
@@ -146,42 +2343,49 @@ def main():
     }
 
     selected_page = st.sidebar.radio("选择功能模块", list(pages.keys()))
+    with st.sidebar:
+        show_perf_panel()
 
     # 侧边栏信息
     st.sidebar.markdown("---")
     st.sidebar.info(f"""
     **系统信息**
-    - 车主数量: {len(st.session_state.owners_data)}
-    - 索赔记录: {len(st.session_state.claims_data)}
+    - 车主数量: {len(repo.owners)}
+    - 索赔记录: {len(repo.claims)}
     - 最后更新: {datetime.now().strftime('%Y-%m-%d %H:%M')}
     """)
 
     # 页面路由
     page_key = pages[selected_page]
-
-    if page_key == "dashboard":
-        show_dashboard()
-    elif page_key == "owners":
-        show_owners_management()
-    elif page_key == "claims":
-        show_claims_management()
-    elif page_key == "statistics":
-        show_statistics()
-    elif page_key == "export":
-        show_export()
-
-
+    profiler = st.session_state.pop("perf_profile_next", None)
+
+    with profiled(profiler) if profiler else contextlib.nullcontext():
+        if page_key == "dashboard":
+            show_dashboard()
+        elif page_key == "owners":
+            show_owners_management()
+        elif page_key == "claims":
+            show_claims_management()
+        elif page_key == "statistics":
+            show_statistics()
+        elif page_key == "export":
+            show_export()
+
+
+@timed("页面:系统概览")
 def show_dashboard():
     """显示系统概览页面"""
+    repo = get_repository()
     st.markdown('<h1 class="main-header">🚗 汽车索赔管理系统概览</h1>', unsafe_allow_html=True)
 
     # 核心指标
     col1, col2, col3, col4 = st.columns(4)
 
-    total_owners = len(st.session_state.owners_data)
-    total_claims = len(st.session_state.claims_data)
-    total_claim_amount = st.session_state.claims_data["索赔金额"].sum()
-    approved_claims = len(st.session_state.claims_data[st.session_state.claims_data["处理状态"] == "已批准"])
+    metrics = get_dashboard_metrics(repo, repo.version)
+    total_owners = metrics["total_owners"]
+    total_claims = metrics["total_claims"]
+    total_claim_amount = metrics["total_claim_amount"]
+    approved_claims = metrics["approved_claims"]
 
     with col1:
         st.metric("车主总数", f"{total_owners:,}", delta="12 本月新增")
@@ -199,111 +2403,87 @@ def show_dashboard():
 
     with col1:
         st.subheader("📈 月度索赔趋势")
-        # 生成月度趋势数据
-        months = pd.date_range(start='2024-01-01', end='2024-12-31', freq='M')
-        monthly_claims = [random.randint(15, 35) for _ in months]
-        monthly_amounts = [random.randint(50000, 150000) for _ in months]
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=[m.strftime('%Y-%m') for m in months],
-            y=monthly_claims,
-            mode='lines+markers',
-            name='索赔数量',
-            line=dict(color='#1f77b4')
-        ))
-        fig.update_layout(
-            title="月度索赔数量趋势",
-            xaxis_title="月份",
-            yaxis_title="索赔数量",
-            height=400
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("图表:月度索赔趋势"):
+            # 演示数据每次重跑随机生成，不走图表缓存
+            months = pd.date_range(start='2024-01-01', end='2024-12-31', freq='M')
+            monthly_claims = [random.randint(15, 35) for _ in months]
+            monthly_amounts = [random.randint(50000, 150000) for _ in months]
+
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=[m.strftime('%Y-%m') for m in months],
+                y=monthly_claims,
+                mode='lines+markers',
+                name='索赔数量',
+                line=dict(color='#1f77b4')
+            ))
+            fig.update_layout(
+                title="月度索赔数量趋势",
+                xaxis_title="月份",
+                yaxis_title="索赔数量",
+                height=400
+            )
+            st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("🏷️ 索赔类型分布")
-        claim_type_counts = st.session_state.claims_data["索赔类型"].value_counts()
-
-        fig = px.pie(
-            values=claim_type_counts.values,
-            names=claim_type_counts.index,
-            title="索赔类型占比分布"
-        )
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("图表:索赔类型分布"):
+            fig = pie_figure(metrics["claim_type_counts"], "索赔类型占比分布", labels_inside=True, height=400)
+            st.plotly_chart(fig, use_container_width=True)
 
     # 最新动态
     st.subheader("📊 最新索赔动态")
-    recent_claims = st.session_state.claims_data.nlargest(10, "创建时间")[
-        ["索赔编号", "车主编号", "索赔类型", "索赔金额", "处理状态", "申请日期"]
-    ]
+    recent_claims = metrics["recent_claims"]
     st.dataframe(recent_claims, use_container_width=True)
 
     # 状态统计
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("📋 处理状态统计")
-        status_counts = st.session_state.claims_data["处理状态"].value_counts()
-
-        fig = px.bar(
-            x=status_counts.index,
-            y=status_counts.values,
-            title="各状态案件数量",
-            color=status_counts.values,
-            color_continuous_scale="Blues"
-        )
-        fig.update_layout(height=350)
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("图表:处理状态统计"):
+            fig = bar_figure(metrics["status_counts"], "各状态案件数量", "Blues", height=350)
+            st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("🚗 热门车型统计")
-        brand_counts = st.session_state.owners_data["车辆品牌"].value_counts().head(8)
-
-        fig = px.bar(
-            x=brand_counts.values,
-            y=brand_counts.index,
-            orientation='h',
-            title="车辆品牌分布",
-            color=brand_counts.values,
-            color_continuous_scale="Greens"
-        )
-        fig.update_layout(height=350)
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("图表:热门车型统计"):
+            fig = bar_figure(metrics["brand_counts"], "车辆品牌分布", "Greens", horizontal=True, height=350)
+            st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("页面:车主管理")
 def show_owners_management():
     """显示车主管理页面"""
     st.markdown('<h1 class="main-header">👥 车主信息管理</h1>', unsafe_allow_html=True)
+    show_flash()
+    show_owners_sections()
+
+
+@st.fragment
+@timed("片段:车主管理")
+def show_owners_sections():
+    """车主管理的各选项卡，切换选项卡、筛选和翻页只重跑这一片段"""
+    repo = get_repository()
 
     # 功能选项卡
-    tab1, tab2, tab3, tab4 = st.tabs(["🔍 查询车主", "➕ 新增车主", "✏️ 修改信息", "📋 车主列表"])
+    section = lazy_tabs(["🔍 查询车主", "➕ 新增车主", "✏️ 修改信息", "📋 车主列表", "📥 批量导入"], key="owners_section")
 
-    with tab1:
+    if section == "🔍 查询车主":
         st.subheader("🔍 车主信息查询")
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            search_type = st.selectbox("查询方式", ["车主编号", "姓名", "车牌号", "电话号码"])
-        with col2:
-            search_value = st.text_input("请输入查询内容")
-        with col3:
-            st.write("")  # 空格
-            search_btn = st.button("🔍 查询", type="primary")
+        # 表单内输入不触发重跑，点查询时一次提交
+        with st.form("owners_search_form", border=False):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                search_type = st.selectbox("查询方式", ["车主编号", "姓名", "车牌号", "电话号码"])
+            with col2:
+                search_value = st.text_input("请输入查询内容")
+            with col3:
+                st.write("")  # 空格
+                search_btn = st.form_submit_button("🔍 查询", type="primary")
 
         if search_btn and search_value:
-            if search_type == "车主编号":
-                result = st.session_state.owners_data[
-                    st.session_state.owners_data["车主编号"].str.contains(search_value, na=False)]
-            elif search_type == "姓名":
-                result = st.session_state.owners_data[
-                    st.session_state.owners_data["姓名"].str.contains(search_value, na=False)]
-            elif search_type == "车牌号":
-                result = st.session_state.owners_data[
-                    st.session_state.owners_data["车牌号"].str.contains(search_value, na=False)]
-            elif search_type == "电话号码":
-                result = st.session_state.owners_data[
-                    st.session_state.owners_data["电话号码"].str.contains(search_value, na=False)]
+            result = repo.search_owners(search_type, search_value)
 
             if not result.empty:
                 st.success(f"找到 {len(result)} 条匹配记录")
@@ -313,31 +2493,33 @@ def show_owners_management():
         else:
             # 显示示例数据
             st.info("💡 以下是车主信息示例数据")
-            sample_data = st.session_state.owners_data.head(10)
+            sample_data = repo.owners_data.head(10)
             st.dataframe(sample_data, use_container_width=True)
 
-    with tab2:
+    elif section == "➕ 新增车主":
         st.subheader("➕ 新增车主信息")
 
-        col1, col2 = st.columns(2)
-        with col1:
-            new_name = st.text_input("姓名", placeholder="请输入车主姓名")
-            new_id_card = st.text_input("身份证号", placeholder="请输入18位身份证号")
-            new_phone = st.text_input("电话号码", placeholder="请输入11位手机号")
-            new_email = st.text_input("邮箱", placeholder="请输入邮箱地址")
-            new_address = st.text_area("地址", placeholder="请输入详细地址")
+        with st.form("new_owner_form", border=False):
+            col1, col2 = st.columns(2)
+            with col1:
+                new_name = st.text_input("姓名", placeholder="请输入车主姓名")
+                new_id_card = st.text_input("身份证号", placeholder="请输入18位身份证号")
+                new_phone = st.text_input("电话号码", placeholder="请输入11位手机号")
+                new_email = st.text_input("邮箱", placeholder="请输入邮箱地址")
+                new_address = st.text_area("地址", placeholder="请输入详细地址")
 
-        with col2:
-            new_plate = st.text_input("车牌号", placeholder="例：京A12345")
-            new_brand = st.selectbox("车辆品牌",
-                                     ["奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚", "福特"])
-            new_model = st.text_input("车辆型号", placeholder="请输入车辆型号")
-            new_buy_date = st.date_input("购买日期")
-            new_insurance_expire = st.date_input("保险到期日")
-
-        if st.button("💾 保存车主信息", type="primary"):
+            with col2:
+                new_plate = st.text_input("车牌号", placeholder="例：京A12345")
+                new_brand = st.selectbox("车辆品牌", CAR_BRANDS)
+                new_model = st.text_input("车辆型号", placeholder="请输入车辆型号")
+                new_buy_date = st.date_input("购买日期")
+                new_insurance_expire = st.date_input("保险到期日")
+
+            submitted = st.form_submit_button("💾 保存车主信息", type="primary")
+
+        if submitted:
             if new_name and new_id_card and new_phone:
-                new_owner_id = f"OW{str(len(st.session_state.owners_data) + 1).zfill(6)}"
+                new_owner_id = repo.next_owner_id()
                 new_row = {
                     "车主编号": new_owner_id,
                     "姓名": new_name,
@@ -352,137 +2534,132 @@ def show_owners_management():
                     "保险到期日": new_insurance_expire.strftime("%Y-%m-%d"),
                     "注册时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
-                st.session_state.owners_data = pd.concat([st.session_state.owners_data, pd.DataFrame([new_row])],
-                                                         ignore_index=True)
-                st.success("✅ 车主信息保存成功！")
-                st.balloons()
+                repo.add_owner(new_row)
+                flash("✅ 车主信息保存成功！")
             else:
                 st.error("❌ 请填写必填字段（姓名、身份证号、电话号码）")
 
-    with tab3:
+    elif section == "✏️ 修改信息":
         st.subheader("✏️ 修改车主信息")
 
         # 选择要修改的车主
-        owner_ids = st.session_state.owners_data["车主编号"].tolist()
+        owner_ids = repo.owners_data["车主编号"].tolist()
         selected_owner_id = st.selectbox("选择车主", owner_ids)
 
         if selected_owner_id:
-            owner_info = \
-            st.session_state.owners_data[st.session_state.owners_data["车主编号"] == selected_owner_id].iloc[0]
+            owner_info = repo.get_owner(selected_owner_id)
 
-            col1, col2 = st.columns(2)
-            with col1:
-                edit_name = st.text_input("姓名", value=owner_info["姓名"])
-                edit_phone = st.text_input("电话号码", value=owner_info["电话号码"])
-                edit_email = st.text_input("邮箱", value=owner_info["邮箱"])
-                edit_address = st.text_area("地址", value=owner_info["地址"])
+            # 选择车主在表单外，换人时立即带出该车主的信息
+            with st.form("edit_owner_form", border=False):
+                col1, col2 = st.columns(2)
+                with col1:
+                    edit_name = st.text_input("姓名", value=owner_info["姓名"])
+                    edit_phone = st.text_input("电话号码", value=owner_info["电话号码"])
+                    edit_email = st.text_input("邮箱", value=owner_info["邮箱"])
+                    edit_address = st.text_area("地址", value=owner_info["地址"])
 
-            with col2:
-                edit_plate = st.text_input("车牌号", value=owner_info["车牌号"])
-                edit_brand = st.selectbox("车辆品牌",
-                                          ["奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚",
-                                           "福特"],
-                                          index=["奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚",
-                                                 "福特"].index(owner_info["车辆品牌"]) if owner_info["车辆品牌"] in [
-                                              "奔驰", "宝马", "奥迪", "大众", "丰田", "本田", "日产", "现代", "起亚",
-                                              "福特"] else 0)
-                edit_model = st.text_input("车辆型号", value=owner_info["车辆型号"])
-                edit_insurance_expire = st.date_input("保险到期日",
-                                                      value=pd.to_datetime(owner_info["保险到期日"]).date())
-
-            if st.button("💾 更新信息", type="primary"):
+                with col2:
+                    edit_plate = st.text_input("车牌号", value=owner_info["车牌号"])
+                    edit_brand = st.selectbox("车辆品牌", CAR_BRANDS,
+                                              index=CAR_BRANDS.index(owner_info["车辆品牌"]) if owner_info[
+                                                  "车辆品牌"] in CAR_BRANDS else 0)
+                    edit_model = st.text_input("车辆型号", value=owner_info["车辆型号"])
+                    edit_insurance_expire = st.date_input("保险到期日",
+                                                          value=owner_info["保险到期日"].date())
+
+                submitted = st.form_submit_button("💾 更新信息", type="primary")
+
+            if submitted:
                 # 更新数据
-                idx = st.session_state.owners_data[st.session_state.owners_data["车主编号"] == selected_owner_id].index[
-                    0]
-                st.session_state.owners_data.loc[idx, "姓名"] = edit_name
-                st.session_state.owners_data.loc[idx, "电话号码"] = edit_phone
-                st.session_state.owners_data.loc[idx, "邮箱"] = edit_email
-                st.session_state.owners_data.loc[idx, "地址"] = edit_address
-                st.session_state.owners_data.loc[idx, "车牌号"] = edit_plate
-                st.session_state.owners_data.loc[idx, "车辆品牌"] = edit_brand
-                st.session_state.owners_data.loc[idx, "车辆型号"] = edit_model
-                st.session_state.owners_data.loc[idx, "保险到期日"] = edit_insurance_expire.strftime("%Y-%m-%d")
-
-                st.success("✅ 车主信息更新成功！")
-                st.balloons()
-
-    with tab4:
+                repo.update_owner(selected_owner_id, {
+                    "姓名": edit_name,
+                    "电话号码": edit_phone,
+                    "邮箱": edit_email,
+                    "地址": edit_address,
+                    "车牌号": edit_plate,
+                    "车辆品牌": edit_brand,
+                    "车辆型号": edit_model,
+                    "保险到期日": edit_insurance_expire.strftime("%Y-%m-%d")
+                })
+
+                flash("✅ 车主信息更新成功！")
+
+    elif section == "📋 车主列表":
         st.subheader("📋 车主信息列表")
 
         # 筛选选项
         col1, col2, col3 = st.columns(3)
         with col1:
-            brand_filter = st.selectbox("品牌筛选", ["全部"] + list(st.session_state.owners_data["车辆品牌"].unique()))
+            brand_filter = st.selectbox("品牌筛选", ["全部"] + list(repo.owners_data["车辆品牌"].unique()))
         with col2:
             city_filter = st.selectbox("城市筛选", ["全部"] + [addr.split("市")[0] + "市" for addr in
-                                                               st.session_state.owners_data["地址"] if "市" in addr])
+                                                               repo.owners_data["地址"] if "市" in addr])
         with col3:
             sort_by = st.selectbox("排序方式", ["注册时间", "姓名", "车主编号"])
 
         # 应用筛选
-        filtered_data = st.session_state.owners_data.copy()
+        query = Query(repo.owners_data)
         if brand_filter != "全部":
-            filtered_data = filtered_data[filtered_data["车辆品牌"] == brand_filter]
+            query.equals("车辆品牌", brand_filter)
 
-        # 排序
-        if sort_by == "注册时间":
-            filtered_data = filtered_data.sort_values("注册时间", ascending=False)
-        elif sort_by == "姓名":
-            filtered_data = filtered_data.sort_values("姓名")
-        else:
-            filtered_data = filtered_data.sort_values("车主编号")
+        st.info(f"共找到 {query.count()} 条车主记录")
+        # 排序并分页显示
+        show_paged_dataframe(query, sort_by, sort_by != "注册时间", key="owners_list")
 
-        st.info(f"共找到 {len(filtered_data)} 条车主记录")
-        st.dataframe(filtered_data, use_container_width=True)
+    elif section == "📥 批量导入":
+        show_bulk_import("owners")
 
 
+@timed("页面:索赔管理")
 def show_claims_management():
     """显示索赔管理页面"""
     st.markdown('<h1 class="main-header">📋 索赔信息管理</h1>', unsafe_allow_html=True)
+    show_flash()
+    show_claims_sections()
+
+
+@st.fragment
+@timed("片段:索赔管理")
+def show_claims_sections():
+    """索赔管理的各选项卡，切换选项卡、筛选和翻页只重跑这一片段"""
+    repo = get_repository()
 
     # 功能选项卡
-    tab1, tab2, tab3, tab4 = st.tabs(["🔍 查询索赔", "➕ 新增索赔", "⚙️ 处理索赔", "📋 索赔列表"])
+    section = lazy_tabs(["🔍 查询索赔", "➕ 新增索赔", "⚙️ 处理索赔", "📋 索赔列表", "📥 批量导入"], key="claims_section")
 
-    with tab1:
+    if section == "🔍 查询索赔":
         st.subheader("🔍 索赔信息查询")
 
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            search_type = st.selectbox("查询方式", ["索赔编号", "车主编号", "索赔类型", "处理状态"])
-        with col2:
-            if search_type in ["索赔类型", "处理状态"]:
-                if search_type == "索赔类型":
-                    search_value = st.selectbox("选择类型", st.session_state.claims_data["索赔类型"].unique())
+        # 查询方式决定输入控件的类型，放在表单外；其余条件在表单内，点查询时一次提交
+        search_type = st.selectbox("查询方式", ["索赔编号", "车主编号", "索赔类型", "处理状态"])
+        with st.form("claims_search_form", border=False):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if search_type in ["索赔类型", "处理状态"]:
+                    if search_type == "索赔类型":
+                        search_value = st.selectbox("选择类型", repo.claims_data["索赔类型"].unique())
+                    else:
+                        search_value = st.selectbox("选择状态", repo.claims_data["处理状态"].unique())
                 else:
-                    search_value = st.selectbox("选择状态", st.session_state.claims_data["处理状态"].unique())
-            else:
-                search_value = st.text_input("请输入查询内容")
-        with col3:
-            date_range = st.date_input("申请日期范围",
-                                       value=[datetime.now().date() - timedelta(days=30), datetime.now().date()],
-                                       key="search_date")
-        with col4:
-            st.write("")
-            search_btn = st.button("🔍 查询索赔", type="primary")
+                    search_value = st.text_input("请输入查询内容")
+            with col2:
+                date_range = st.date_input("申请日期范围",
+                                           value=[datetime.now().date() - timedelta(days=30), datetime.now().date()],
+                                           key="search_date")
+            with col3:
+                st.write("")
+                search_btn = st.form_submit_button("🔍 查询索赔", type="primary")
 
         if search_btn:
-            if search_type == "索赔编号":
-                result = st.session_state.claims_data[
-                    st.session_state.claims_data["索赔编号"].str.contains(str(search_value), na=False)]
-            elif search_type == "车主编号":
-                result = st.session_state.claims_data[
-                    st.session_state.claims_data["车主编号"].str.contains(str(search_value), na=False)]
-            elif search_type == "索赔类型":
-                result = st.session_state.claims_data[st.session_state.claims_data["索赔类型"] == search_value]
-            elif search_type == "处理状态":
-                result = st.session_state.claims_data[st.session_state.claims_data["处理状态"] == search_value]
+            if search_type in ["索赔编号", "车主编号"]:
+                query = Query(repo.search_claims(search_type, str(search_value)))
+            else:
+                query = repo.query_claims().equals(search_type, search_value)
 
             # 应用日期筛选
             if len(date_range) == 2:
-                result = result[
-                    (pd.to_datetime(result["申请日期"]) >= pd.to_datetime(date_range[0])) &
-                    (pd.to_datetime(result["申请日期"]) <= pd.to_datetime(date_range[1]))
-                    ]
+                query.between("申请日期", date_range[0], date_range[1])
+            result = query.result()
 
             if not result.empty:
                 st.success(f"找到 {len(result)} 条匹配记录")
@@ -503,41 +2680,46 @@ def show_claims_management():
         else:
             # 显示示例数据
             st.info("💡 以下是索赔信息示例数据")
-            sample_data = st.session_state.claims_data.head(10)
+            sample_data = repo.claims_data.head(10)
             st.dataframe(sample_data, use_container_width=True)
 
-    with tab2:
+    elif section == "➕ 新增索赔":
         st.subheader("➕ 新增索赔申请")
 
+        # 选择车主在表单外，换人时立即显示该车主的信息
         col1, col2 = st.columns(2)
         with col1:
-            owner_ids = st.session_state.owners_data["车主编号"].tolist()
+            owner_ids = repo.owners_data["车主编号"].tolist()
             new_owner_id = st.selectbox("选择车主", owner_ids)
-            new_claim_type = st.selectbox("索赔类型",
-                                          ["车辆碰撞", "自然灾害", "盗抢", "自燃", "涉水", "玻璃破损", "轮胎损坏",
-                                           "划痕"])
-            new_accident_date = st.date_input("事故日期")
-            new_claim_amount = st.number_input("索赔金额", min_value=0, value=5000, step=100)
 
         with col2:
-            new_description = st.text_area("事故描述", placeholder="请详细描述事故经过...")
-            new_handler = st.selectbox("处理人员", ["王处理员", "李审核员", "张专员", "赵主管", "钱经理"])
-
             # 显示选中车主信息
             if new_owner_id:
-                owner_info = \
-                st.session_state.owners_data[st.session_state.owners_data["车主编号"] == new_owner_id].iloc[0]
+                owner_info = repo.get_owner(new_owner_id)
                 st.info(f"""
                 **车主信息**
                 - 姓名: {owner_info['姓名']}
                 - 车牌号: {owner_info['车牌号']}
                 - 车辆: {owner_info['车辆品牌']} {owner_info['车辆型号']}
-                - 保险到期: {owner_info['保险到期日']}
+                - 保险到期: {owner_info['保险到期日']:%Y-%m-%d}
                 """)
 
-        if st.button("💾 提交索赔申请", type="primary"):
+        with st.form("new_claim_form", border=False):
+            col1, col2 = st.columns(2)
+            with col1:
+                new_claim_type = st.selectbox("索赔类型", CLAIM_TYPES)
+                new_accident_date = st.date_input("事故日期")
+                new_claim_amount = st.number_input("索赔金额", min_value=0, value=5000, step=100)
+
+            with col2:
+                new_description = st.text_area("事故描述", placeholder="请详细描述事故经过...")
+                new_handler = st.selectbox("处理人员", HANDLERS)
+
+            submitted = st.form_submit_button("💾 提交索赔申请", type="primary")
+
+        if submitted:
             if new_owner_id and new_claim_type and new_description:
-                new_claim_id = f"CL{str(len(st.session_state.claims_data) + 1).zfill(6)}"
+                new_claim_id = repo.next_claim_id()
                 new_row = {
                     "索赔编号": new_claim_id,
                     "车主编号": new_owner_id,
@@ -553,27 +2735,24 @@ def show_claims_management():
                     "创建时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     "更新时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
-                st.session_state.claims_data = pd.concat([st.session_state.claims_data, pd.DataFrame([new_row])],
-                                                         ignore_index=True)
-                st.success(f"✅ 索赔申请提交成功！申请编号：{new_claim_id}")
-                st.balloons()
+                repo.add_claim(new_row)
+                flash(f"✅ 索赔申请提交成功！申请编号：{new_claim_id}")
             else:
                 st.error("❌ 请填写所有必填字段")
 
-    with tab3:
+    elif section == "⚙️ 处理索赔":
         st.subheader("⚙️ 索赔处理")
 
         # 选择要处理的索赔
-        pending_claims = st.session_state.claims_data[
-            st.session_state.claims_data["处理状态"].isin(["待审核", "审核中"])]
+        pending_claims = repo.claims_data[
+            repo.claims_data["处理状态"].isin(["待审核", "审核中"])]
 
         if not pending_claims.empty:
             claim_ids = pending_claims["索赔编号"].tolist()
             selected_claim_id = st.selectbox("选择待处理索赔", claim_ids)
 
             if selected_claim_id:
-                claim_info = \
-                st.session_state.claims_data[st.session_state.claims_data["索赔编号"] == selected_claim_id].iloc[0]
+                claim_info = repo.get_claim(selected_claim_id)
 
                 # 显示索赔详情
                 col1, col2 = st.columns(2)
@@ -583,8 +2762,8 @@ def show_claims_management():
                     - 索赔编号: {claim_info['索赔编号']}
                     - 车主编号: {claim_info['车主编号']}
                     - 索赔类型: {claim_info['索赔类型']}
-                    - 事故日期: {claim_info['事故日期']}
-                    - 申请日期: {claim_info['申请日期']}
+                    - 事故日期: {claim_info['事故日期']:%Y-%m-%d}
+                    - 申请日期: {claim_info['申请日期']:%Y-%m-%d}
                     - 索赔金额: ¥{claim_info['索赔金额']:,.0f}
                     """)
 
@@ -592,108 +2771,103 @@ def show_claims_management():
                     st.text_area("事故描述", value=claim_info['事故描述'], disabled=True)
 
                 # 处理选项
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    new_status = st.selectbox("处理结果", ["审核中", "已批准", "已拒绝", "已结案"])
-                with col2:
-                    approved_amount = st.number_input("批准金额", min_value=0, max_value=int(claim_info['索赔金额']),
-                                                      value=int(claim_info['索赔金额']))
-                with col3:
-                    handler = st.selectbox("处理人员", ["王处理员", "李审核员", "张专员", "赵主管", "钱经理"],
-                                           index=["王处理员", "李审核员", "张专员", "赵主管", "钱经理"].index(
-                                               claim_info['处理人员']) if claim_info['处理人员'] in ["王处理员",
-                                                                                                     "李审核员",
-                                                                                                     "张专员", "赵主管",
-                                                                                                     "钱经理"] else 0)
-
-                remarks = st.text_area("处理备注", placeholder="请输入处理备注...")
-
-                if st.button("💾 保存处理结果", type="primary"):
+                with st.form("process_claim_form", border=False):
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        new_status = st.selectbox("处理结果", ["审核中", "已批准", "已拒绝", "已结案"])
+                    with col2:
+                        approved_amount = st.number_input("批准金额", min_value=0,
+                                                          max_value=int(claim_info['索赔金额']),
+                                                          value=int(claim_info['索赔金额']))
+                    with col3:
+                        handler = st.selectbox("处理人员", HANDLERS,
+                                               index=HANDLERS.index(claim_info['处理人员']) if claim_info[
+                                                   '处理人员'] in HANDLERS else 0)
+
+                    remarks = st.text_area("处理备注", placeholder="请输入处理备注...")
+
+                    submitted = st.form_submit_button("💾 保存处理结果", type="primary")
+
+                if submitted:
                     # 更新索赔信息
-                    idx = \
-                    st.session_state.claims_data[st.session_state.claims_data["索赔编号"] == selected_claim_id].index[0]
-                    st.session_state.claims_data.loc[idx, "处理状态"] = new_status
-                    st.session_state.claims_data.loc[idx, "批准金额"] = approved_amount
-                    st.session_state.claims_data.loc[idx, "处理人员"] = handler
-                    st.session_state.claims_data.loc[idx, "处理备注"] = remarks
-                    st.session_state.claims_data.loc[idx, "更新时间"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    st.success("✅ 索赔处理结果保存成功！")
-                    st.balloons()
+                    repo.update_claim(selected_claim_id, {
+                        "处理状态": new_status,
+                        "批准金额": approved_amount,
+                        "处理人员": handler,
+                        "处理备注": remarks,
+                        "更新时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
+
+                    flash("✅ 索赔处理结果保存成功！")
         else:
             st.info("🎉 暂无待处理的索赔申请")
             # 显示最近处理的索赔
-            recent_processed = st.session_state.claims_data[
-                st.session_state.claims_data["处理状态"].isin(["已批准", "已拒绝", "已结案"])].nlargest(10, "更新时间")
+            recent_processed = repo.query_claims().isin("处理状态", ["已批准", "已拒绝", "已结案"]).largest(
+                "更新时间", 10)
             st.subheader("最近处理的索赔")
             st.dataframe(recent_processed, use_container_width=True)
 
-    with tab4:
+    elif section == "📋 索赔列表":
         st.subheader("📋 索赔记录列表")
 
         # 筛选选项
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            type_filter = st.selectbox("类型筛选", ["全部"] + list(st.session_state.claims_data["索赔类型"].unique()))
+            type_filter = st.selectbox("类型筛选", ["全部"] + list(repo.claims_data["索赔类型"].unique()))
         with col2:
-            status_filter = st.selectbox("状态筛选", ["全部"] + list(st.session_state.claims_data["处理状态"].unique()))
+            status_filter = st.selectbox("状态筛选", ["全部"] + list(repo.claims_data["处理状态"].unique()))
         with col3:
             amount_range = st.selectbox("金额范围", ["全部", "0-5000", "5000-20000", "20000-50000", "50000以上"])
         with col4:
             sort_by = st.selectbox("排序方式", ["申请日期", "索赔金额", "更新时间"])
 
         # 应用筛选
-        filtered_data = st.session_state.claims_data.copy()
+        query = repo.query_claims()
         if type_filter != "全部":
-            filtered_data = filtered_data[filtered_data["索赔类型"] == type_filter]
+            query.equals("索赔类型", type_filter)
         if status_filter != "全部":
-            filtered_data = filtered_data[filtered_data["处理状态"] == status_filter]
+            query.equals("处理状态", status_filter)
 
         # 金额筛选
-        if amount_range == "0-5000":
-            filtered_data = filtered_data[filtered_data["索赔金额"] <= 5000]
-        elif amount_range == "5000-20000":
-            filtered_data = filtered_data[(filtered_data["索赔金额"] > 5000) & (filtered_data["索赔金额"] <= 20000)]
-        elif amount_range == "20000-50000":
-            filtered_data = filtered_data[(filtered_data["索赔金额"] > 20000) & (filtered_data["索赔金额"] <= 50000)]
-        elif amount_range == "50000以上":
-            filtered_data = filtered_data[filtered_data["索赔金额"] > 50000]
-
-        # 排序
-        if sort_by == "申请日期":
-            filtered_data = filtered_data.sort_values("申请日期", ascending=False)
-        elif sort_by == "索赔金额":
-            filtered_data = filtered_data.sort_values("索赔金额", ascending=False)
-        else:
-            filtered_data = filtered_data.sort_values("更新时间", ascending=False)
+        if amount_range != "全部":
+            query.range("索赔金额", *AMOUNT_RANGES[amount_range])
 
         # 显示统计信息
+        record_count = query.count()
+        claim_amounts = query.values("索赔金额")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("记录总数", len(filtered_data))
+            st.metric("记录总数", record_count)
         with col2:
-            st.metric("索赔总额", f"¥{filtered_data['索赔金额'].sum():,.0f}")
+            st.metric("索赔总额", f"¥{claim_amounts.sum():,.0f}")
         with col3:
-            st.metric("批准总额", f"¥{filtered_data['批准金额'].sum():,.0f}")
+            st.metric("批准总额", f"¥{query.values('批准金额').sum():,.0f}")
         with col4:
-            if len(filtered_data) > 0:
-                avg_amount = filtered_data['索赔金额'].mean()
+            if record_count > 0:
+                avg_amount = claim_amounts.mean()
                 st.metric("平均金额", f"¥{avg_amount:,.0f}")
 
-        st.dataframe(filtered_data, use_container_width=True)
+        # 排序并分页显示
+        show_paged_dataframe(query, sort_by, False, key="claims_list")
+
+    elif section == "📥 批量导入":
+        show_bulk_import("claims")
 
 
+@timed("页面:数据统计")
 def show_statistics():
     """显示数据统计页面"""
+    repo = get_repository()
     st.markdown('<h1 class="main-header">📈 数据统计分析</h1>', unsafe_allow_html=True)
 
     # 统计概览
     col1, col2, col3, col4 = st.columns(4)
 
-    total_owners = len(st.session_state.owners_data)
-    total_claims = len(st.session_state.claims_data)
-    avg_claim_amount = st.session_state.claims_data["索赔金额"].mean()
-    max_claim_amount = st.session_state.claims_data["索赔金额"].max()
+    metrics = get_statistics_metrics(repo, repo.version)
+    total_owners = metrics["total_owners"]
+    total_claims = metrics["total_claims"]
+    avg_claim_amount = metrics["avg_claim_amount"]
+    max_claim_amount = metrics["max_claim_amount"]
 
     with col1:
         st.metric("车主总数", f"{total_owners:,}")
@@ -712,182 +2886,89 @@ def show_statistics():
     with col1:
         st.subheader("📊 索赔金额分布")
 
-        # 创建金额区间
-        bins = [0, 5000, 10000, 20000, 50000, float('inf')]
-        labels = ['0-5K', '5K-10K', '10K-20K', '20K-50K', '50K+']
-        st.session_state.claims_data['金额区间'] = pd.cut(st.session_state.claims_data['索赔金额'], bins=bins,
-                                                          labels=labels)
-        amount_dist = st.session_state.claims_data['金额区间'].value_counts()
-
-        fig = px.bar(
-            x=amount_dist.index,
-            y=amount_dist.values,
-            title="索赔金额区间分布",
-            color=amount_dist.values,
-            color_continuous_scale="Blues"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("图表:索赔金额分布"):
+            fig = bar_figure(metrics["amount_dist"], "索赔金额区间分布", "Blues")
+            st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("🕒 申请时间趋势")
 
-        # 按月统计
-        st.session_state.claims_data['申请月份'] = pd.to_datetime(
-            st.session_state.claims_data['申请日期']).dt.to_period('M')
-        monthly_claims = st.session_state.claims_data['申请月份'].value_counts().sort_index()
+        with timed("图表:申请时间趋势"):
+            # 按月统计
+            fig = line_figure(metrics["monthly_claims"], "月度申请趋势", xaxis_title="月份", yaxis_title="申请数量")
+            st.plotly_chart(fig, use_container_width=True)
+
+    show_statistics_sections()
 
-        fig = px.line(
-            x=[str(month) for month in monthly_claims.index],
-            y=monthly_claims.values,
-            title="月度申请趋势",
-            markers=True
-        )
-        fig.update_layout(xaxis_title="月份", yaxis_title="申请数量")
-        st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+@timed("片段:数据统计")
+def show_statistics_sections():
+    """详细分析的各选项卡，切换选项卡只重跑这一片段，上方的概览图表不动"""
+    repo = get_repository()
+    metrics = get_statistics_metrics(repo, repo.version)
 
     # 详细分析
-    tab1, tab2, tab3 = st.tabs(["🚗 车辆分析", "💰 金额分析", "⏱️ 时间分析"])
+    section = lazy_tabs(["🚗 车辆分析", "💰 金额分析", "⏱️ 时间分析"], key="statistics_section")
 
-    with tab1:
+    if section == "🚗 车辆分析":
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("车辆品牌索赔统计")
 
-            # 获取车主信息与索赔信息的合并数据
-            merged_data = st.session_state.claims_data.merge(
-                st.session_state.owners_data[['车主编号', '车辆品牌']],
-                on='车主编号',
-                how='left'
-            )
-
-            brand_claims = merged_data['车辆品牌'].value_counts()
-
-            fig = px.pie(
-                values=brand_claims.values,
-                names=brand_claims.index,
-                title="各品牌索赔案件占比"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            with timed("图表:车辆品牌索赔统计"):
+                fig = pie_figure(metrics["brand_claims"], "各品牌索赔案件占比")
+                st.plotly_chart(fig, use_container_width=True)
 
         with col2:
             st.subheader("品牌平均索赔金额")
 
-            brand_avg_amount = merged_data.groupby('车辆品牌')['索赔金额'].mean().sort_values(ascending=True)
+            with timed("图表:品牌平均索赔金额"):
+                fig = bar_figure(metrics["brand_avg_amount"], "各品牌平均索赔金额", "Reds", horizontal=True)
+                st.plotly_chart(fig, use_container_width=True)
 
-            fig = px.bar(
-                x=brand_avg_amount.values,
-                y=brand_avg_amount.index,
-                orientation='h',
-                title="各品牌平均索赔金额",
-                color=brand_avg_amount.values,
-                color_continuous_scale="Reds"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-
-    with tab2:
+    elif section == "💰 金额分析":
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("索赔类型金额分析")
 
-            type_amount = st.session_state.claims_data.groupby('索赔类型')['索赔金额'].sum().sort_values(
-                ascending=False)
-
-            fig = px.bar(
-                x=type_amount.index,
-                y=type_amount.values,
-                title="各类型索赔总金额",
-                color=type_amount.values,
-                color_continuous_scale="Greens"
-            )
-            fig.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
+            with timed("图表:索赔类型金额分析"):
+                fig = bar_figure(metrics["type_amount"], "各类型索赔总金额", "Greens", xaxis_tickangle=-45)
+                st.plotly_chart(fig, use_container_width=True)
 
         with col2:
             st.subheader("批准率分析")
 
-            approval_stats = st.session_state.claims_data.groupby('索赔类型').agg({
-                '索赔编号': 'count',
-                '处理状态': lambda x: (x == '已批准').sum()
-            }).rename(columns={'索赔编号': '总数', '处理状态': '批准数'})
-            approval_stats['批准率'] = (approval_stats['批准数'] / approval_stats['总数'] * 100).round(1)
-
-            fig = px.bar(
-                x=approval_stats.index,
-                y=approval_stats['批准率'],
-                title="各类型索赔批准率",
-                color=approval_stats['批准率'],
-                color_continuous_scale="RdYlBu"
-            )
-            fig.update_layout(yaxis_title="批准率 (%)", xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
+            with timed("图表:批准率分析"):
+                fig = bar_figure(metrics["approval_stats"]['批准率'], "各类型索赔批准率", "RdYlBu",
+                                 yaxis_title="批准率 (%)", xaxis_tickangle=-45)
+                st.plotly_chart(fig, use_container_width=True)
 
-    with tab3:
+    elif section == "⏱️ 时间分析":
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("处理时效分析")
 
-            # 计算处理天数
-            st.session_state.claims_data['申请日期_dt'] = pd.to_datetime(st.session_state.claims_data['申请日期'])
-            st.session_state.claims_data['更新日期_dt'] = pd.to_datetime(st.session_state.claims_data['更新时间'])
-            st.session_state.claims_data['处理天数'] = (
-                        st.session_state.claims_data['更新日期_dt'] - st.session_state.claims_data[
-                    '申请日期_dt']).dt.days
-
-            processing_time = st.session_state.claims_data[
-                st.session_state.claims_data['处理状态'].isin(['已批准', '已拒绝', '已结案'])]
-            avg_processing_by_type = processing_time.groupby('索赔类型')['处理天数'].mean().sort_values()
-
-            fig = px.bar(
-                x=avg_processing_by_type.values,
-                y=avg_processing_by_type.index,
-                orientation='h',
-                title="各类型平均处理天数",
-                color=avg_processing_by_type.values,
-                color_continuous_scale="Viridis"
-            )
-            fig.update_layout(xaxis_title="天数")
-            st.plotly_chart(fig, use_container_width=True)
+            with timed("图表:处理时效分析"):
+                fig = bar_figure(metrics["avg_processing_by_type"], "各类型平均处理天数", "Viridis", horizontal=True,
+                                 xaxis_title="天数")
+                st.plotly_chart(fig, use_container_width=True)
 
         with col2:
             st.subheader("季度索赔趋势")
 
-            st.session_state.claims_data['申请季度'] = pd.to_datetime(
-                st.session_state.claims_data['申请日期']).dt.to_period('Q')
-            quarterly_claims = st.session_state.claims_data['申请季度'].value_counts().sort_index()
-            quarterly_amount = st.session_state.claims_data.groupby('申请季度')['索赔金额'].sum()
-
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=[str(q) for q in quarterly_claims.index],
-                y=quarterly_claims.values,
-                mode='lines+markers',
-                name='索赔数量',
-                yaxis='y'
-            ))
-            fig.add_trace(go.Scatter(
-                x=[str(q) for q in quarterly_amount.index],
-                y=quarterly_amount.values,
-                mode='lines+markers',
-                name='索赔金额',
-                yaxis='y2',
-                line=dict(color='red')
-            ))
-
-            fig.update_layout(
-                title="季度索赔数量与金额趋势",
-                xaxis_title="季度",
-                yaxis=dict(title="索赔数量", side="left"),
-                yaxis2=dict(title="索赔金额", side="right", overlaying="y"),
-                legend=dict(x=0.01, y=0.99)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            with timed("图表:季度索赔趋势"):
+                fig = quarterly_figure(metrics["quarterly_claims"], metrics["quarterly_amount"])
+                st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("页面:数据导出")
 def show_export():
     """显示数据导出页面"""
+    repo = get_repository()
     st.markdown('<h1 class="main-header">💾 数据导出</h1>', unsafe_allow_html=True)
 
     st.subheader("📊 数据导出选项")
@@ -903,7 +2984,11 @@ def show_export():
             default=["车主信息", "索赔记录"]
         )
 
-        file_format = st.selectbox("选择文件格式", ["Excel (.xlsx)", "CSV (.csv)"])
+        formats = [name for name in EXPORT_FORMATS if pa is not None or name not in COLUMNAR_FORMATS]
+        file_format = st.selectbox("选择文件格式", formats)
+        compression = None
+        if file_format in COLUMNAR_FORMATS:
+            compression = st.selectbox("压缩方式", EXPORT_COMPRESSIONS[file_format])
 
         date_filter = st.checkbox("按日期筛选索赔记录")
         if date_filter:
@@ -917,90 +3002,68 @@ def show_export():
         st.markdown("### 📈 数据预览")
 
         if "车主信息" in export_options:
-            st.info(f"车主信息: {len(st.session_state.owners_data)} 条记录")
-            st.dataframe(st.session_state.owners_data.head(3), use_container_width=True)
+            st.info(f"车主信息: {len(repo.owners)} 条记录")
+            st.dataframe(repo.owners_data.head(3), use_container_width=True)
 
         if "索赔记录" in export_options:
-            claims_to_export = st.session_state.claims_data.copy()
+            claims_query = repo.query_claims()
             if date_filter and len(date_range) == 2:
-                claims_to_export = claims_to_export[
-                    (pd.to_datetime(claims_to_export["申请日期"]) >= pd.to_datetime(date_range[0])) &
-                    (pd.to_datetime(claims_to_export["申请日期"]) <= pd.to_datetime(date_range[1]))
-                    ]
-            st.info(f"索赔记录: {len(claims_to_export)} 条记录")
-            st.dataframe(claims_to_export.head(3), use_container_width=True)
+                claims_query.between("申请日期", date_range[0], date_range[1])
+            st.info(f"索赔记录: {claims_query.count()} 条记录")
+            st.dataframe(claims_query.head(3), use_container_width=True)
 
     st.markdown("---")
 
     # 生成导出文件
     if st.button("🎯 生成导出文件", type="primary"):
         if export_options:
-            dataframes = []
-            sheet_names = []
-
-            if "车主信息" in export_options:
-                dataframes.append(st.session_state.owners_data)
-                sheet_names.append("车主信息")
-
-            if "索赔记录" in export_options:
-                claims_to_export = st.session_state.claims_data.copy()
-                if date_filter and len(date_range) == 2:
-                    claims_to_export = claims_to_export[
-                        (pd.to_datetime(claims_to_export["申请日期"]) >= pd.to_datetime(date_range[0])) &
-                        (pd.to_datetime(claims_to_export["申请日期"]) <= pd.to_datetime(date_range[1]))
+            dates = tuple(date_range) if date_filter and len(date_range) == 2 else None
+
+            def build():
+                dataframes = []
+                sheet_names = []
+
+                if "车主信息" in export_options:
+                    dataframes.append(repo.owners_data.copy())
+                    sheet_names.append("车主信息")
+
+                if "索赔记录" in export_options:
+                    claims_query = repo.query_claims()
+                    if dates is not None:
+                        claims_query.between("申请日期", dates[0], dates[1])
+                    dataframes.append(claims_query.snapshot())
+                    sheet_names.append("索赔记录")
+
+                if "统计报告" in export_options:
+                    # 生成统计报告
+                    stats = repo.stats
+                    stats_data = {
+                        "统计项目": [
+                            "车主总数", "索赔总数", "索赔总金额", "批准总金额",
+                            "平均索赔金额", "最高索赔金额", "批准率", "拒绝率"
+                        ],
+                        "数值": [
+                            stats.total_owners,
+                            stats.total_claims,
+                            stats.total_claim_amount,
+                            stats.total_approved_amount,
+                            stats.total_claim_amount / stats.total_claims,
+                            stats.max_claim_amount,
+                            stats.status_counts["已批准"] / stats.total_claims * 100,
+                            stats.status_counts["已拒绝"] / stats.total_claims * 100
                         ]
-                dataframes.append(claims_to_export)
-                sheet_names.append("索赔记录")
-
-            if "统计报告" in export_options:
-                # 生成统计报告
-                stats_data = {
-                    "统计项目": [
-                        "车主总数", "索赔总数", "索赔总金额", "批准总金额",
-                        "平均索赔金额", "最高索赔金额", "批准率", "拒绝率"
-                    ],
-                    "数值": [
-                        len(st.session_state.owners_data),
-                        len(st.session_state.claims_data),
-                        st.session_state.claims_data["索赔金额"].sum(),
-                        st.session_state.claims_data["批准金额"].sum(),
-                        st.session_state.claims_data["索赔金额"].mean(),
-                        st.session_state.claims_data["索赔金额"].max(),
-                        len(st.session_state.claims_data[st.session_state.claims_data["处理状态"] == "已批准"]) / len(
-                            st.session_state.claims_data) * 100,
-                        len(st.session_state.claims_data[st.session_state.claims_data["处理状态"] == "已拒绝"]) / len(
-                            st.session_state.claims_data) * 100
-                    ]
-                }
-                stats_df = pd.DataFrame(stats_data)
-                dataframes.append(stats_df)
-                sheet_names.append("统计报告")
-
-            if file_format == "Excel (.xlsx)":
-                excel_data = export_to_excel(dataframes, sheet_names)
-                filename = f"汽车索赔数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-                st.download_button(
-                    label="📥 下载 Excel 文件",
-                    data=excel_data,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            else:
-                # CSV格式导出
-                for df, name in zip(dataframes, sheet_names):
-                    csv_data = df.to_csv(index=False, encoding='utf-8-sig')
-                    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-
-                    st.download_button(
-                        label=f"📥 下载 {name} CSV",
-                        data=csv_data,
-                        file_name=filename,
-                        mime="text/csv"
-                    )
-
-            st.success("✅ 导出文件已生成！点击上方按钮下载。")
-            st.balloons()
+                    }
+                    stats_df = pd.DataFrame(stats_data)
+                    dataframes.append(stats_df)
+                    sheet_names.append("统计报告")
+
+                return dataframes, sheet_names
+
+            # 选项按固定顺序排列，勾选顺序不同的相同请求也能复用
+            options = tuple(option for option in ["车主信息", "索赔记录", "统计报告"] if option in export_options)
+            submit_export((repo.version, options, file_format, compression, dates), build, file_format,
+                          compression=compression)
+            st.success("✅ 导出任务已提交，完成后在下方下载。")
         else:
             st.error("❌ 请至少选择一项要导出的数据")
 
@@ -1012,37 +3075,195 @@ def show_export():
 
     with col1:
         if st.button("📋 导出所有车主信息", use_container_width=True):
-            csv_data = st.session_state.owners_data.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button(
-                label="📥 下载车主信息CSV",
-                data=csv_data,
-                file_name=f"车主信息_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            submit_export((repo.version, ("车主信息",), "CSV (.csv)", None, None),
+                          lambda: ([repo.owners_data.copy()], ["车主信息"]), "CSV (.csv)")
 
     with col2:
         if st.button("📊 导出所有索赔记录", use_container_width=True):
-            csv_data = st.session_state.claims_data.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button(
-                label="📥 下载索赔记录CSV",
-                data=csv_data,
-                file_name=f"索赔记录_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            submit_export((repo.version, ("索赔记录",), "CSV (.csv)", None, None),
+                          lambda: ([repo.claims_data.copy()], ["索赔记录"]), "CSV (.csv)")
 
     with col3:
         if st.button("📈 导出完整报告", use_container_width=True):
-            excel_data = export_to_excel(
-                [st.session_state.owners_data, st.session_state.claims_data],
-                ["车主信息", "索赔记录"]
-            )
-            st.download_button(
-                label="📥 下载完整报告Excel",
-                data=excel_data,
-                file_name=f"汽车索赔完整报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            submit_export((repo.version, ("车主信息", "索赔记录"), "Excel (.xlsx)", None, None),
+                          lambda: ([repo.owners_data.copy(), repo.claims_data.copy()], ["车主信息", "索赔记录"]),
+                          "Excel (.xlsx)", title="汽车索赔完整报告")
+
+    show_export_jobs()
+
+
+def benchmark_cases(repo):
+    """基准测试覆盖的各页面数据路径：用例名 -> 无参函数
+
+    带缓存的聚合函数每次传入新的版本号，保证测到的是重新计算的耗时。
+    """
+    versions = itertools.count(repo.version + 1)
+    owner_id = repo.owners_data["车主编号"].iloc[len(repo.owners_data) // 2]
+
+    def claims_list():
+        query = repo.query_claims().equals("处理状态", "已批准").range("索赔金额", *AMOUNT_RANGES["5000-20000"])
+        query.count()
+        query.values("索赔金额").sum()
+        paginate(query, "申请日期", False, 1, PAGE_SIZES[0])
+
+    def owners_list():
+        query = Query(repo.owners_data).equals("车辆品牌", CAR_BRANDS[0])
+        paginate(query, "注册时间", False, 1, PAGE_SIZES[0])
+
+    return {
+        "dashboard": lambda: get_dashboard_metrics.__wrapped__(repo, next(versions)),
+        "owner_search": lambda: repo.search_owners("姓名", OWNER_NAMES[0] + "1"),
+        "claim_search": lambda: repo.search_claims("车主编号", owner_id),
+        "owners_list": owners_list,
+        "claims_list": claims_list,
+        "statistics": lambda: get_statistics_metrics.__wrapped__(repo, next(versions)),
+        "export_excel": lambda: export_to_excel([repo.owners_data, repo.claims_data], ["车主信息", "索赔记录"]).close(),
+        "export_csv": lambda: export_to_csv(repo.claims_data).close()
+    }
+
+
+def page_cases(db_path):
+    """用 AppTest 无界面渲染各页面：用例名 -> 无参函数，测的是切换到该页面后的一次完整重跑"""
+    from streamlit.testing.v1 import AppTest
+    os.environ["CLAIMS_DB_PATH"] = db_path
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    app = AppTest.from_file(os.path.abspath(__file__), default_timeout=600)
+    app.run()
+    labels = app.sidebar.radio[0].options
+
+    def render(label):
+        app.sidebar.radio[0].set_value(label).run()
+        if app.exception:
+            raise RuntimeError(f"{label} 渲染出错：{app.exception[0].message}")
+
+    return {f"page:{label}": partial(render, label) for label in labels}
+
+
+def measure(func, repeat):
+    """先预热一次，再取 repeat 次耗时的中位数（毫秒），另跑一次用 tracemalloc 记录峰值内存（MB）"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return float(np.median(timings)), peak / 1024 / 1024
+
+
+def run_benchmarks(sizes=BENCH_SIZES, repeat=BENCH_REPEAT, pages=True, cases=None, seed=0):
+    """在各数据规模下运行基准测试，返回结果表
+
+    每个规模用 seed 生成一个临时库；cases 为要运行的用例名列表，None 表示全部。
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "bench.db")
+            write_generated_data(db_path, max(size // 5, 1), size, seed=seed, today="2024-12-31")
+            repo = ClaimsRepository(db_path)
+            benches = benchmark_cases(repo)
+            if pages:
+                benches.update(page_cases(db_path))
+            for name, func in benches.items():
+                if cases is None or name in cases:
+                    milliseconds, peak_mb = measure(func, repeat)
+                    results.append({"用例": name, "规模": size, "耗时(ms)": round(milliseconds, 3),
+                                    "峰值内存(MB)": round(peak_mb, 2)})
+                    print(f"{name} @ {size}: {milliseconds:.1f} ms, {peak_mb:.1f} MB", file=sys.stderr)
+            st.cache_resource.clear()
+            st.cache_data.clear()
+    return pd.DataFrame(results)
+
+
+def compare_with_baseline(results, baseline, threshold=BENCH_THRESHOLD):
+    """与基线比较，baseline 为 {"用例@规模": 耗时毫秒}；比值超过 threshold 的记为退化"""
+    keys = results["用例"] + "@" + results["规模"].astype(str)
+    results = results.assign(**{"基线(ms)": keys.map(baseline)})
+    results["比值"] = (results["耗时(ms)"] / results["基线(ms)"]).round(2)
+    results["退化"] = results["比值"] > threshold
+    return results
+
+
+def run_cli(argv):
+    """命令行入口，例如：python zy1.py import claims 索赔记录.parquet --errors 错误明细.csv"""
+    parser = argparse.ArgumentParser(prog="zy1.py", description="汽车索赔管理系统命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="从 CSV/Excel/Parquet 文件批量导入车主或索赔")
+    import_parser.add_argument("target", choices=list(IMPORT_TARGETS), help="导入车主（owners）或索赔（claims）")
+    import_parser.add_argument("path", help="导入文件路径")
+    import_parser.add_argument("--errors", help="错误明细输出路径（CSV）")
+    import_parser.add_argument("--db", default=DB_PATH, help="SQLite数据库路径")
+    generate_parser = subparsers.add_parser("generate", help="生成测试数据写入新的数据库")
+    generate_parser.add_argument("--owners", type=int, default=50, help="车主数")
+    generate_parser.add_argument("--claims", type=int, default=120, help="索赔数")
+    generate_parser.add_argument("--seed", type=int, help="随机种子，相同种子和日期生成相同的数据")
+    generate_parser.add_argument("--today", help="生成日期的基准日（YYYY-MM-DD），默认今天")
+    generate_parser.add_argument("--db", default=DB_PATH, help="SQLite数据库路径")
+    bench_parser = subparsers.add_parser("bench", help="在不同数据规模下测量各页面数据路径的耗时和峰值内存")
+    bench_parser.add_argument("--sizes", type=int, nargs="+", default=BENCH_SIZES, help="索赔条数，可给多个")
+    bench_parser.add_argument("--repeat", type=int, default=BENCH_REPEAT, help="每个用例的重复次数")
+    bench_parser.add_argument("--cases", nargs="+", help="只运行这些用例")
+    bench_parser.add_argument("--no-pages", action="store_true", help="不运行 AppTest 页面渲染用例")
+    bench_parser.add_argument("--baseline", help="基线文件（JSON），存在时与之比较")
+    bench_parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线文件")
+    bench_parser.add_argument("--threshold", type=float, default=BENCH_THRESHOLD, help="耗时超过基线多少倍算退化")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        results = run_benchmarks(args.sizes, args.repeat, pages=not args.no_pages, cases=args.cases)
+        regressed = False
+        if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+            with open(args.baseline, encoding="utf-8") as file:
+                results = compare_with_baseline(results, json.load(file), args.threshold)
+            regressed = bool(results["退化"].any())
+        print(results.to_string(index=False))
+        if args.baseline and args.save_baseline:
+            baseline = dict(zip(results["用例"] + "@" + results["规模"].astype(str), results["耗时(ms)"]))
+            with open(args.baseline, "w", encoding="utf-8") as file:
+                json.dump(baseline, file, ensure_ascii=False, indent=2)
+            print(f"基线已写入 {args.baseline}")
+        return 1 if regressed else 0
+
+    if args.command == "generate":
+        written = Counter()
+
+        def report(table, rows):
+            written[table] += rows
+            print(f"{table}: 已写入 {written[table]} 行", file=sys.stderr)
+
+        try:
+            write_generated_data(args.db, args.owners, args.claims, args.seed, args.today, progress=report)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"已生成 {args.owners} 个车主、{args.claims} 条索赔：{args.db}")
+        return 0
+
+    repo = ClaimsRepository(args.db)
+    read_rows = [0]
+
+    def advance(rows):
+        read_rows[0] += rows
+        print(f"已校验 {read_rows[0]} 行", file=sys.stderr)
+
+    with open(args.path, "rb") as file:
+        imported, errors = import_file(repo, args.target, file, args.path, progress=advance)
+    print(f"导入 {imported} 条，{errors['行号'].nunique()} 行未通过校验")
+    if args.errors and len(errors):
+        errors.to_csv(args.errors, index=False, encoding="utf-8-sig")
+        print(f"错误明细已写入 {args.errors}")
+    return 1 if len(errors) else 0
 
 
 if __name__ == "__main__":
+    # 用 python 带参数运行时作为命令行工具；streamlit run 和 AppTest 下即使带参数也显示页面
+    if len(sys.argv) > 1 and not st.runtime.exists():
+        sys.exit(run_cli(sys.argv[1:]))
     main()
\ No newline at end of file